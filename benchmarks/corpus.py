@@ -0,0 +1,209 @@
+"""Synthetic MCP registry, npm and PyPI data for the benchmarks.
+
+The corpora are generated deterministically from a seed, so results of different runs are comparable.
+Besides ordinary packages, every corpus contains servers with pathological npm dependency graphs.
+"""
+import base64
+import hashlib
+import json
+import random
+from urllib.parse import quote
+
+# number of MCP servers in each corpus, the registry-sized one is roughly the size of the MCP registry
+CORPORA = {
+    "small": 10,
+    "medium": 100,
+    "registry": 1500,
+}
+
+REGISTRY_HOST = "registry.modelcontextprotocol.io"
+NPM_HOST = "registry.npmjs.org"
+PYPI_HOST = "pypi.org"
+FILES_HOST = "files.pythonhosted.org"
+HOSTS = (REGISTRY_HOST, NPM_HOST, PYPI_HOST, FILES_HOST)
+
+_PLATFORM_TAGS = [
+    "cp313-cp313-manylinux_2_17_x86_64.manylinux2014_x86_64",
+    "cp313-cp313-manylinux_2_17_aarch64.manylinux2014_aarch64",
+    "cp313-cp313-musllinux_1_2_x86_64",
+    "cp313-cp313-win_amd64",
+    "cp313-cp313-macosx_11_0_arm64",
+    "cp312-cp312-manylinux_2_17_x86_64.manylinux2014_x86_64",
+    "cp312-cp312-win_amd64",
+    "cp312-cp312-macosx_11_0_arm64",
+    "cp311-cp311-manylinux_2_17_x86_64.manylinux2014_x86_64",
+    "cp311-cp311-win_amd64",
+]
+
+def _digest(*parts: str) -> bytes:
+    return hashlib.sha512("\0".join(parts).encode()).digest()
+
+class Corpus:
+    """Responses of the registries, keyed by host and path as requested, e.g. "pypi.org/simple/foo/"."""
+
+    def __init__(self, name: str, servers: int, seed: int=0):
+        self.name = name
+        self.random = random.Random(seed)
+        self.responses: dict[str, bytes] = {}
+        self.registry_entries: list[dict] = []
+        self._npm_versions: dict[str, dict[str, dict]] = {}
+        self._pypi_files: dict[str, list[dict]] = {}
+
+        npm_servers = servers * 3 // 5
+        self._generate_npm(npm_servers)
+        self._generate_pypi(servers - npm_servers)
+        self._generate_pathological_npm()
+
+        for name, versions in self._npm_versions.items():
+            latest = max(versions, key=lambda v: tuple(map(int, v.split("."))))
+            packument = {"name": name, "dist-tags": {"latest": latest}, "versions": versions}
+            self.responses[f"{NPM_HOST}/{quote(name, safe='@')}"] = json.dumps(packument).encode()
+        for name, files in self._pypi_files.items():
+            simple = {
+                "meta": {"api-version": "1.1"},
+                "name": name,
+                "versions": sorted({file["version"] for file in files}, key=lambda v: tuple(map(int, v.split(".")))),
+                "files": [{key: value for key, value in file.items() if key != "version"} for file in files],
+            }
+            self.responses[f"{PYPI_HOST}/simple/{name}/"] = json.dumps(simple).encode()
+
+    # npm
+
+    def _add_npm_version(self, name: str, version: str, dependencies: dict[str, str]):
+        integrity = "sha512-" + base64.b64encode(_digest("npm", name, version)).decode()
+        self._npm_versions.setdefault(name, {})[version] = {
+            "name": name,
+            "version": version,
+            "dependencies": dependencies,
+            "dist": {
+                "integrity": integrity,
+                "tarball": f"https://{NPM_HOST}/{name}/-/{name.split('/')[-1]}-{version}.tgz",
+            },
+        }
+
+    def _add_server(self, registry_type: str, identifier: str):
+        idx = len(self.registry_entries)
+        self.registry_entries.append({
+            "name": f"io.github.bench/{identifier.replace('@', '').replace('/', '-')}",
+            "description": f"Benchmark server {idx} for {identifier} with {self.random.choice(['files', 'search', 'database', 'git'])} tools",
+            "version": "1.0.0",
+            "repository": {"url": f"https://github.com/bench/{idx}", "source": "github"},
+            "packages": [{"registryType": registry_type, "identifier": identifier, "version": "1.0.0"}],
+            "_meta": {"io.modelcontextprotocol.registry/official": {
+                "id": f"server-{idx}",
+                "updatedAt": f"2025-01-01T00:00:{idx % 60:02d}Z",
+            }},
+        })
+
+    def _generate_npm(self, servers: int):
+        libraries = [f"lib-{i}" if i % 7 else f"@bench/lib-{i}" for i in range(servers * 4 + 20)]
+        majors: dict[str, int] = {}
+        for i, name in enumerate(libraries):
+            majors[name] = self.random.randint(1, 3)
+            # libraries only depend on libraries with a lower index, so there are no cycles
+            for major in range(1, majors[name] + 1):
+                for minor in range(self.random.randint(1, 3)):
+                    dependencies = {}
+                    for dep in self.random.sample(libraries[:i], min(i, self.random.randint(0, 4))):
+                        dependencies[dep] = f"^{self.random.randint(1, majors[dep])}.0.0"
+                    self._add_npm_version(name, f"{major}.{minor}.0", dependencies)
+
+        for i in range(servers):
+            name = f"mcp-server-{i}"
+            deps = self.random.sample(libraries, self.random.randint(3, 10))
+            self._add_npm_version(name, "1.0.0", {dep: f"^{self.random.randint(1, majors[dep])}.0.0" for dep in deps})
+            self._add_server("npm", name)
+
+    def _generate_pathological_npm(self):
+        # a long dependency chain
+        chain_length = 300
+        for i in range(chain_length):
+            self._add_npm_version(f"chain-{i}", "1.0.0", {f"chain-{i + 1}": "^1.0.0"} if i + 1 < chain_length else {})
+        self._add_npm_version("mcp-server-deep", "1.0.0", {"chain-0": "^1.0.0"})
+        self._add_server("npm", "mcp-server-deep")
+
+        # many direct dependencies
+        for i in range(400):
+            self._add_npm_version(f"leaf-{i}", "1.0.0", {})
+        self._add_npm_version("mcp-server-wide", "1.0.0", {f"leaf-{i}": "^1.0.0" for i in range(400)})
+        self._add_server("npm", "mcp-server-wide")
+
+        # a lattice of diamonds, whose fully expanded tree has 6^12 paths
+        layers, width = 12, 6
+        for layer in range(layers):
+            for i in range(width):
+                next_layer = {f"lattice-{layer + 1}-{j}": "^1.0.0" for j in range(width)} if layer + 1 < layers else {}
+                self._add_npm_version(f"lattice-{layer}-{i}", "1.0.0", next_layer)
+        self._add_npm_version("mcp-server-lattice", "1.0.0", {f"lattice-0-{i}": "^1.0.0" for i in range(width)})
+        self._add_server("npm", "mcp-server-lattice")
+
+        # conflicting versions of a shared dependency, which have to be nested
+        for major in range(1, 21):
+            self._add_npm_version("conflict-shared", f"{major}.0.0", {})
+        for i in range(40):
+            self._add_npm_version(f"conflict-user-{i}", "1.0.0", {"conflict-shared": f"^{i % 20 + 1}.0.0"})
+        self._add_npm_version("mcp-server-conflicts", "1.0.0", {f"conflict-user-{i}": "^1.0.0" for i in range(40)})
+        self._add_server("npm", "mcp-server-conflicts")
+
+        # a dependency cycle
+        self._add_npm_version("cycle-a", "1.0.0", {"cycle-b": "^1.0.0"})
+        self._add_npm_version("cycle-b", "1.0.0", {"cycle-a": "^1.0.0"})
+        self._add_npm_version("mcp-server-cycle", "1.0.0", {"cycle-a": "^1.0.0"})
+        self._add_server("npm", "mcp-server-cycle")
+
+    # PyPI
+
+    def _add_pypi_release(self, name: str, version: str, requirements: list[str], wheels: int):
+        filenames = [f"{name.replace('-', '_')}-{version}.tar.gz"]
+        if wheels == 1:
+            filenames.append(f"{name.replace('-', '_')}-{version}-py3-none-any.whl")
+        else:
+            filenames += [f"{name.replace('-', '_')}-{version}-{tag}.whl" for tag in _PLATFORM_TAGS[:wheels]]
+        for filename in filenames:
+            url = f"https://{FILES_HOST}/packages/{hashlib.sha256(filename.encode()).hexdigest()[:8]}/{filename}"
+            metadata = "\n".join([
+                "Metadata-Version: 2.1",
+                f"Name: {name}",
+                f"Version: {version}",
+                *(f"Requires-Dist: {requirement}" for requirement in requirements),
+            ]) + "\n"
+            is_wheel = filename.endswith(".whl")
+            if is_wheel:
+                self.responses[f"{FILES_HOST}/{url.split('/', 3)[3]}.metadata"] = metadata.encode()
+            self._pypi_files.setdefault(name, []).append({
+                "version": version,
+                "filename": filename,
+                "url": url,
+                "hashes": {"sha256": hashlib.sha256(_digest("pypi", filename)).hexdigest()},
+                "requires-python": ">=3.9",
+                "core-metadata": {"sha256": hashlib.sha256(metadata.encode()).hexdigest()} if is_wheel else False,
+                "yanked": False,
+            })
+
+    def _generate_pypi(self, servers: int):
+        libraries = [f"pylib-{i}" for i in range(servers * 3 + 10)]
+        for i, name in enumerate(libraries):
+            # a few packages with many wheels per release, like numpy
+            wheels = len(_PLATFORM_TAGS) if i % 10 == 0 else 1
+            for minor in range(self.random.randint(1, 4)):
+                requirements = []
+                for dep in self.random.sample(libraries[:i], min(i, self.random.randint(0, 3))):
+                    requirement = f"{dep}>=1.0"
+                    if self.random.random() < 0.2:
+                        requirement += ' ; sys_platform == "win32"'
+                    requirements.append(requirement)
+                self._add_pypi_release(name, f"1.{minor}.0", requirements, wheels)
+
+        for i in range(servers):
+            name = f"mcp-pyserver-{i}"
+            requirements = [f"{dep}>=1.0" for dep in self.random.sample(libraries, self.random.randint(2, 8))]
+            self._add_pypi_release(name, "1.0.0", requirements, 1)
+            self._add_server("pypi", name)
+
+    def registry_page(self, limit: int, cursor: str | None) -> bytes:
+        start = int(cursor) if cursor else 0
+        end = start + limit
+        page = {"servers": self.registry_entries[start:end], "metadata": {}}
+        if end < len(self.registry_entries):
+            page["metadata"]["nextCursor"] = str(end)
+        return json.dumps(page).encode()
@@ -0,0 +1,98 @@
+"""Time the parsing of large lockfiles.
+
+    python -m benchmarks.lockfiles --entries 5000
+
+Synthetic package-lock.json and poetry.lock files are written in the format npm and Poetry
+write them, including nested node_modules paths, and parsed --repeat times each.
+"""
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import argparse
+import base64
+import hashlib
+import json
+import random
+
+import tomlkit
+
+from collector.npm_package_info import parse_npm_lock
+from collector.pypi_package_info import parse_poetry_lock
+
+DEFAULT_ENTRIES = 5000
+DEFAULT_REPEAT = 20
+NESTED_FRACTION = 0.1
+FILES_PER_RELEASE = 8
+
+def _digest(seed: str) -> bytes:
+    return hashlib.sha512(seed.encode()).digest()
+
+def write_npm_lock(path: Path, entries: int, rng: random.Random):
+    names = [f"package-{i}" for i in range(entries)]
+    packages: dict[str, dict] = {"": {"name": "example-project", "version": "1.0.0", "dependencies": {names[0]: "*"}}}
+    for i, name in enumerate(names):
+        lock_path = f"node_modules/{name}"
+        if i > 0 and rng.random() < NESTED_FRACTION:
+            # a second version of an earlier package, nested under this one
+            nested = rng.choice(names[:i])
+            packages[f"{lock_path}/node_modules/{nested}"] = {
+                "version": "2.0.0",
+                "integrity": "sha512-" + base64.b64encode(_digest(f"{nested}@2")).decode(),
+            }
+        packages[lock_path] = {
+            "version": "1.0.0",
+            "integrity": "sha512-" + base64.b64encode(_digest(f"{name}@1")).decode(),
+            "dependencies": {dependency: "^1.0.0" for dependency in rng.sample(names, min(3, entries))},
+        }
+    path.write_text(json.dumps({"name": "example-project", "lockfileVersion": 3, "packages": packages}, indent=2))
+
+def write_poetry_lock(path: Path, entries: int, rng: random.Random):
+    names = [f"package-{i}" for i in range(entries)]
+    document = tomlkit.document()
+    lock_packages = tomlkit.aot()
+    for name in names:
+        lock_package = tomlkit.table()
+        lock_package["name"] = name
+        lock_package["version"] = "1.0.0"
+        lock_package["files"] = [
+            {"file": f"{name.replace('-', '_')}-1.0.0-py3-none-any-{i}.whl", "hash": f"sha256:{hashlib.sha256(f'{name}{i}'.encode()).hexdigest()}"}
+            for i in range(FILES_PER_RELEASE)
+        ]
+        dependencies = tomlkit.table()
+        for dependency in rng.sample(names, min(3, entries)):
+            dependencies[dependency] = ">=1.0"
+        lock_package["dependencies"] = dependencies
+        lock_packages.append(lock_package)
+    document["package"] = lock_packages
+    path.write_text(tomlkit.dumps(document))
+
+def measure(parse, path: Path, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        packages = parse(path)
+        times.append(perf_counter() - start)
+    return {"packages": len(packages), "best_ms": round(min(times) * 1000, 2), "median_ms": round(sorted(times)[len(times) // 2] * 1000, 2)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", default=DEFAULT_ENTRIES, type=int, help="Packages per lockfile")
+    parser.add_argument("--repeat", default=DEFAULT_REPEAT, type=int, help="Parses per lockfile")
+    parser.add_argument("--seed", default=0, type=int)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with TemporaryDirectory() as tmp_dir:
+        npm_lock = Path(tmp_dir) / "package-lock.json"
+        poetry_lock = Path(tmp_dir) / "poetry.lock"
+        write_npm_lock(npm_lock, args.entries, rng)
+        write_poetry_lock(poetry_lock, args.entries, rng)
+        results = {
+            "entries": args.entries,
+            "package-lock.json": measure(parse_npm_lock, npm_lock, args.repeat),
+            "poetry.lock": measure(parse_poetry_lock, poetry_lock, args.repeat),
+        }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Time the stages of the collector against a local stand-in for the registries.
+
+    python -m benchmarks.run --corpus medium --output results.json
+    python -m benchmarks.run --corpus medium --compare results.json
+
+The registry is downloaded and then collected into a dataset by build_dataset, like a run
+of collector.main without caches. The time of each stage is taken from the run report of
+the collector. The stages of individual servers (resolution, graph, attestations, write) are
+summed over all servers, so with --jobs > 1 they can add up to more than the total.
+
+With --recorded, the HTTP cache of a previous collector run is replayed instead, which
+includes real attestations and thus Sigstore verification.
+"""
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, process_time
+import argparse
+import json
+import platform
+import sys
+
+from collector.artifact_selection import artifact_selection
+from collector.dataset import OUTPUT_FORMATS, Dataset
+from collector.http_client import http_client
+from collector.instrumentation import instrumentation
+from collector.main import build_dataset, build_run_report
+from collector.mcp_registry_downloader import iter_registry
+
+from .corpus import CORPORA
+from .server import StandInServer
+
+DEFAULT_THRESHOLD = 0.25
+MIN_REGRESSION_S = 0.05
+
+def run_collector(work_dir: Path, registry_path: Path, update_registry: bool, jobs: int, limit: int | None,
+                  output_format: str) -> dict:
+    """Collect a dataset in work_dir and return the timings of the run."""
+    wall, cpu = perf_counter(), process_time()
+    if update_registry:
+        with instrumentation.stage("registry"):
+            for _ in iter_registry(registry_path):
+                pass
+    out_dir = work_dir / "out"
+    build_dataset(work_dir / "run", out_dir, limit=limit, jobs=jobs, registry_path=registry_path,
+                  output_format=output_format, update_registry=False)
+    wall, cpu = perf_counter() - wall, process_time() - cpu
+
+    report = build_run_report()
+    stages = {stage: timing.model_dump() for stage, timing in report.stages.items()}
+    for stage, timing in stages.items():
+        print(f"{stage}: {timing['wall_s']:.3f}s wall, {timing['cpu_s']:.3f}s CPU, {timing['count']} times", file=sys.stderr)
+    return {
+        "servers": stages.get("server", {}).get("count", 0),
+        "written": len(Dataset(out_dir, hashed=output_format == "hashed").package_files()),
+        "total_wall_s": round(wall, 4),
+        "total_cpu_s": round(cpu, 4),
+        "stages": stages,
+        "caches": report.caches,
+    }
+
+def _with_total(results: dict) -> dict[str, dict]:
+    # the stages of servers add up to more than the run with --jobs > 1, so the total is compared as well
+    total = results.get("total_wall_s")
+    return {**({"total": {"wall_s": total}} if total is not None else {}), **results["stages"]}
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """List the stages whose wall time regressed by more than threshold compared to a baseline."""
+    regressions: list[str] = []
+    baseline_stages = _with_total(baseline)
+    for stage, result in _with_total(results).items():
+        baseline_result = baseline_stages.get(stage)
+        if baseline_result is None:
+            continue
+        slowdown = result["wall_s"] - baseline_result["wall_s"]
+        change = slowdown / baseline_result["wall_s"] if baseline_result["wall_s"] else 0.0
+        print(f"{stage}: {baseline_result['wall_s']:.3f}s -> {result['wall_s']:.3f}s ({change:+.0%})", file=sys.stderr)
+        # stages that take a few milliseconds are mostly noise
+        if change > threshold and slowdown > MIN_REGRESSION_S:
+            regressions.append(stage)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="small", choices=CORPORA, help="Size of the synthetic corpus")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the synthetic corpus")
+    parser.add_argument("--recorded", type=Path, metavar="CACHE_DIR",
+                        help="Replay the registry snapshot and HTTP cache of a previous collector run instead")
+    parser.add_argument("--limit", type=int, help="Maximum number of MCP servers")
+    parser.add_argument("--jobs", default=1, type=int, help="Number of MCP servers to process in parallel")
+    parser.add_argument("--output-format", default="plain", choices=OUTPUT_FORMATS, help="Output format of the dataset")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    parser.add_argument("--compare", type=Path, metavar="BASELINE", help="Compare with the results of a previous run")
+    parser.add_argument("--threshold", default=DEFAULT_THRESHOLD, type=float,
+                        help="Relative slowdown of a stage that counts as a regression")
+    args = parser.parse_args()
+
+    artifact_selection.configure("all")
+
+    # progress output of the collector goes to stderr, so the results can be piped
+    with TemporaryDirectory() as tmp_dir, redirect_stdout(sys.stderr):
+        work_dir = Path(tmp_dir)
+        if args.recorded is not None:
+            http_client.configure_cache(args.recorded, offline=True)
+            run = run_collector(work_dir, args.recorded / "registry.jsonl", False, args.jobs, args.limit, args.output_format)
+            corpus_name = f"recorded:{args.recorded}"
+            requests = None
+        else:
+            with StandInServer(args.corpus, args.seed) as server:
+                http_client.configure(url_overrides=server.url_overrides)
+                run = run_collector(work_dir, work_dir / "registry.jsonl", True, args.jobs, args.limit, args.output_format)
+            requests = server.requests
+            corpus_name = args.corpus
+
+    results = {
+        "corpus": corpus_name,
+        "seed": args.seed,
+        "jobs": args.jobs,
+        "output_format": args.output_format,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "http_requests": requests,
+        **run,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=1))
+    else:
+        print(json.dumps(results, indent=1))
+
+    if args.compare is not None:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
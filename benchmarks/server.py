@@ -0,0 +1,76 @@
+import multiprocessing
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Connection
+from urllib.parse import parse_qs, urlsplit
+
+from .corpus import CORPORA, HOSTS, REGISTRY_HOST, Corpus
+
+def _make_server(corpus: Corpus) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are sent separately, don't wait for the ACK of keep-alive connections
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.server.requests += 1
+            path = self.path.removeprefix("/")
+            if path.startswith(f"{REGISTRY_HOST}/v0/servers"):
+                query = parse_qs(urlsplit(path).query)
+                body = corpus.registry_page(int(query.get("limit", ["100"])[0]), query.get("cursor", [None])[0])
+            else:
+                body = corpus.responses.get(path)
+            if body is None:
+                self.send_response(404)
+                body = b"Not Found"
+            else:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.requests = 0
+    return httpd
+
+def _serve(corpus_name: str, seed: int, connection: Connection):
+    httpd = _make_server(Corpus(corpus_name, CORPORA[corpus_name], seed))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    connection.send(httpd.server_address[1])
+    connection.recv()
+    httpd.shutdown()
+    connection.send(httpd.requests)
+
+class StandInServer:
+    """Local HTTP server standing in for the registries, serving the responses of a synthetic corpus.
+
+    Requests are made to http://127.0.0.1:<port>/<host>/<path>, anything not in the corpus is a 404,
+    like the attestations of packages without provenance. The server runs in a separate process,
+    so it doesn't count towards the CPU time of the benchmark.
+    """
+
+    def __init__(self, corpus_name: str, seed: int=0):
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(corpus_name, seed, child_connection), daemon=True)
+        self.port = 0
+        self.requests = 0
+
+    @property
+    def url_overrides(self) -> dict[str, str]:
+        return {f"https://{host}": f"http://127.0.0.1:{self.port}/{host}" for host in HOSTS}
+
+    def __enter__(self) -> "StandInServer":
+        self._process.start()
+        self.port = self._connection.recv()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.send(None)
+        self.requests = self._connection.recv()
+        self._process.join()
@@ -0,0 +1,85 @@
+import hashlib
+
+from packaging.tags import Tag, compatible_tags, cpython_tags, mac_platforms, parse_tag
+from packaging.utils import InvalidWheelFilename, parse_wheel_filename
+
+from .models import Artifact
+
+# Which files of a PyPI release to verify:
+#   all         every file in the lock
+#   minimal     the sdist and one wheel, preferring a pure Python wheel
+#   compatible  wheels compatible with the configured tags, or the sdist if there are none
+#   sample      a fixed number of files, picked by their hash so the choice is stable across runs
+ARTIFACT_POLICIES = ("all", "minimal", "compatible", "sample")
+
+DEFAULT_SAMPLE_SIZE = 2
+
+def _default_platforms() -> list[str]:
+    # same platforms as the resolver: Linux x86_64/aarch64, Windows and macOS arm64
+    platforms: list[str] = []
+    for arch in ("x86_64", "aarch64"):
+        platforms += [f"manylinux_2_{minor}_{arch}" for minor in range(40, 16, -1)]
+        platforms += [f"manylinux2014_{arch}"]
+    platforms += ["manylinux2010_x86_64", "manylinux1_x86_64", "win_amd64"]
+    platforms += mac_platforms((15, 0), "arm64")
+    return platforms
+
+def default_tags() -> frozenset[Tag]:
+    """Wheel tags installable by CPython 3.13, the Python version dependencies are resolved for."""
+    platforms = _default_platforms()
+    return frozenset([
+        *cpython_tags((3, 13), platforms=platforms),
+        *compatible_tags((3, 13), "cp313", platforms=platforms),
+    ])
+
+def parse_tags(tags: str) -> frozenset[Tag]:
+    """Parse comma-separated wheel tags, e.g. "cp313-cp313-win_amd64,py3-none-any"."""
+    return frozenset(tag for compressed_tag in tags.split(",") if compressed_tag for tag in parse_tag(compressed_tag.strip()))
+
+def _wheel_tags(filename: str) -> frozenset[Tag] | None:
+    if not filename.endswith(".whl"):
+        return None
+    try:
+        return parse_wheel_filename(filename)[3]
+    except InvalidWheelFilename:
+        return None
+
+class ArtifactSelection:
+    def __init__(self):
+        self.policy = "all"
+        self.tags: frozenset[Tag] = frozenset()
+        self.sample_size = DEFAULT_SAMPLE_SIZE
+
+    def configure(self, policy: str="all", tags: frozenset[Tag] | None=None, sample_size: int=DEFAULT_SAMPLE_SIZE):
+        if policy not in ARTIFACT_POLICIES:
+            raise ValueError(f"Unknown artifact policy: {policy}")
+        self.policy = policy
+        self.tags = tags if tags is not None else default_tags()
+        self.sample_size = max(sample_size, 1)
+
+    def _select(self, artifacts: list[Artifact]) -> set[int]:
+        wheel_tags = [_wheel_tags(artifact.name) for artifact in artifacts]
+        others = {i for i, tags in enumerate(wheel_tags) if tags is None}
+        wheels = [i for i, tags in enumerate(wheel_tags) if tags is not None]
+
+        match self.policy:
+            case "minimal":
+                pure = [i for i in wheels if any(tag.abi == "none" and tag.platform == "any" for tag in wheel_tags[i])]
+                return others | set((pure or wheels)[:1])
+            case "compatible":
+                compatible = {i for i in wheels if wheel_tags[i] & self.tags}
+                return compatible or others or set(wheels)
+            case "sample":
+                by_hash = sorted(range(len(artifacts)), key=lambda i: hashlib.sha256(artifacts[i].hash.encode()).digest())
+                return set(by_hash[:self.sample_size])
+            case _:
+                return set(range(len(artifacts)))
+
+    def apply(self, artifacts: list[Artifact]) -> list[Artifact]:
+        """Mark the artifacts of a release that are not verified as skipped and return the others."""
+        selected = self._select(artifacts)
+        for i, artifact in enumerate(artifacts):
+            artifact.skipped = None if i in selected else True
+        return [artifact for i, artifact in enumerate(artifacts) if i in selected]
+
+artifact_selection = ArtifactSelection()
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from importlib.metadata import version
+from pathlib import Path
+
+from pydantic import TypeAdapter
+
+from .models import Attestation
+
+# Bump when the Attestation model or the way attestations are derived changes.
+SCHEMA_VERSION = 2
+
+_ATTESTATIONS = TypeAdapter(list[Attestation])
+
+def _trust_root_version() -> str:
+    # Verification results depend on the trust root and verification logic shipped with these packages.
+    return f"sigstore-{version('sigstore')}-pypi-attestations-{version('pypi-attestations')}"
+
+class AttestationCache:
+    """Two-tier cache of verified attestations: a bounded in-memory LRU backed by an optional on-disk store.
+
+    Entries are keyed by artifact hash and expected repository URL, which fully determine
+    the verification result of an immutable artifact.
+    """
+
+    def __init__(self, cache_dir: Path | None=None, maxsize: int=4096):
+        self._memory: OrderedDict[str, list[Attestation]] = OrderedDict()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._dir: Path | None = None
+        self.hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            self.configure(cache_dir)
+
+    def configure(self, cache_dir: Path | None, maxsize: int | None=None):
+        if maxsize is not None:
+            self._maxsize = maxsize
+        if cache_dir is None:
+            self._dir = None
+            return
+        root = cache_dir / "attestations"
+        self._dir = root / f"v{SCHEMA_VERSION}-{_trust_root_version()}"
+        # entries from other schema or trust root versions are never read again
+        if root.exists():
+            for stale_dir in root.iterdir():
+                if stale_dir != self._dir:
+                    shutil.rmtree(stale_dir, ignore_errors=True)
+
+    @staticmethod
+    def key(registry: str, artifact_hash: str, expected_repository_url: str | None) -> str:
+        return hashlib.sha256(f"{registry}\0{artifact_hash}\0{expected_repository_url or ''}".encode()).hexdigest()
+
+    def get(self, key: str) -> list[Attestation] | None:
+        with self._lock:
+            attestations = self._memory.get(key)
+            if attestations is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return attestations
+
+        if self._dir is not None:
+            try:
+                data = self._path(key).read_bytes()
+            except FileNotFoundError:
+                pass
+            else:
+                attestations = _ATTESTATIONS.validate_json(data)
+                self._remember(key, attestations)
+                with self._lock:
+                    self.hits += 1
+                return attestations
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, attestations: list[Attestation]):
+        self._remember(key, attestations)
+        if self._dir is None:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(_ATTESTATIONS.dump_json(attestations))
+        tmp_path.replace(path)
+
+    def _remember(self, key: str, attestations: list[Attestation]):
+        with self._lock:
+            self._memory[key] = attestations
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._maxsize:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        assert self._dir is not None
+        return self._dir / key[:2] / f"{key}.json"
+
+attestation_cache = AttestationCache()
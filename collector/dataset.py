@@ -0,0 +1,261 @@
+import gzip
+import hashlib
+import json
+from pathlib import Path, PurePosixPath
+
+from packaging.utils import canonicalize_name
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from .models import PACKAGE_INFO_FORMAT_VERSION, Artifact, Attestation, PackageInfo
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Layout of a published dataset:
+#   packages/<registry>_<name>.json  package info of each MCP server
+#   store/<ref[:2]>/<ref>.json       attestations and their statements, stored once and referenced by their content hash
+#   summary.json                     summary of all servers
+#   summary/                         paginated summary for the dashboard
+#   dependents.json                  servers depending on each package version
+#   run_report.json                  timings, HTTP and cache statistics of the run
+#
+# In the hashed output format, files are minified and written under content-hashed names with
+# .gz (and .br if brotli is installed) siblings. manifest.json maps the regular names to the
+# hashed ones, except for the package files, which are mapped by a separate hashed index
+# so the start page does not need to load it.
+
+OUTPUT_FORMATS = ("plain", "hashed")
+
+MANIFEST_PATH = "manifest.json"
+RUN_REPORT_PATH = "run_report.json"
+PACKAGES_DIR = "packages"
+STORE_DIR = "store"
+
+_ATTESTATIONS = TypeAdapter(list[Attestation])
+
+class DatasetManifest(BaseModel):
+    files: dict[str, str] = {}  # regular path -> hashed path
+    packages: str | None = None  # hashed path of the index of the package files
+
+def package_info_filename(package_registry: str, package_name: str) -> str:
+    if package_registry == "pypi":
+        # the registry, the resolver and Poetry may each spell the name differently
+        package_name = canonicalize_name(package_name)
+    return f"{package_registry}_{package_name.replace('/', '@')}.json"
+
+def _hashed_path(path: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    pure_path = PurePosixPath(path)
+    return str(pure_path.with_name(f"{pure_path.stem}.{digest}{pure_path.suffix}"))
+
+class Dataset:
+    """Reads and writes the files of a dataset by their regular path, relative to its directory."""
+
+    def __init__(self, out_dir: Path, hashed: bool=False):
+        self.out_dir = out_dir
+        self.hashed = hashed
+        self._written: set[str] = set()
+        self._files: dict[str, str] = {}
+        self._packages: dict[str, str] = {}
+        if hashed:
+            manifest = self._read_manifest()
+            if manifest is not None:
+                self._files = manifest.files
+                if manifest.packages is not None:
+                    self._packages = json.loads((out_dir / manifest.packages).read_bytes())
+
+    @classmethod
+    def open(cls, out_dir: Path) -> "Dataset":
+        """Open an existing dataset in whichever output format it was written."""
+        return cls(out_dir, hashed=(out_dir / MANIFEST_PATH).exists())
+
+    @property
+    def indent(self) -> int | None:
+        # JSON indentation for files written to this dataset
+        return None if self.hashed else 1
+
+    def _read_manifest(self) -> DatasetManifest | None:
+        try:
+            return DatasetManifest.model_validate_json((self.out_dir / MANIFEST_PATH).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def _mapping(self, path: str) -> dict[str, str]:
+        return self._packages if path.startswith(f"{PACKAGES_DIR}/") else self._files
+
+    def resolve(self, path: str) -> Path:
+        if self.hashed:
+            # content-addressed files, like the store, are not renamed
+            path = self._mapping(path).get(path, path)
+        return self.out_dir / path
+
+    def read(self, path: str) -> bytes:
+        return self.resolve(path).read_bytes()
+
+    def package_files(self) -> dict[str, Path]:
+        """Map the file names of all package info files to their paths."""
+        if self.hashed:
+            return {PurePosixPath(path).name: self.out_dir / hashed_path for path, hashed_path in self._packages.items()}
+        return {json_file.name: json_file for json_file in (self.out_dir / PACKAGES_DIR).glob("*.json")}
+
+    def _write_file(self, path: str, content: bytes):
+        out_path = self.out_dir / path
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_bytes(content)
+        if self.hashed:
+            out_path.with_name(out_path.name + ".gz").write_bytes(gzip.compress(content, mtime=0))
+            if brotli is not None:
+                out_path.with_name(out_path.name + ".br").write_bytes(brotli.compress(content))
+
+    def _delete_file(self, path: str):
+        out_path = self.out_dir / path
+        for suffix in ("", ".gz", ".br"):
+            out_path.with_name(out_path.name + suffix).unlink(missing_ok=True)
+
+    def write(self, path: str, content: str | bytes, content_addressed: bool=False):
+        """Write a file, unless a content-addressed file with that path already exists."""
+        if isinstance(content, str):
+            content = content.encode()
+        if content_addressed:
+            # store entries written in this run are known to exist
+            if path not in self._written and not (self.out_dir / path).exists():
+                self._write_file(path, content)
+            self._written.add(path)
+            return
+        self._written.add(path)
+        if not self.hashed:
+            self._write_file(path, content)
+            return
+
+        # unchanged files keep their name, so caches of the previous version stay valid
+        mapping = self._mapping(path)
+        hashed_path = _hashed_path(path, content)
+        previous_path = mapping.get(path)
+        if previous_path != hashed_path or not (self.out_dir / hashed_path).exists():
+            self._write_file(hashed_path, content)
+        if previous_path is not None and previous_path != hashed_path:
+            self._delete_file(previous_path)
+        mapping[path] = hashed_path
+
+    def delete(self, path: str):
+        self._written.discard(path)
+        if self.hashed:
+            hashed_path = self._mapping(path).pop(path, None)
+            if hashed_path is not None:
+                self._delete_file(hashed_path)
+        else:
+            self._delete_file(path)
+
+    def delete_unwritten(self, directory: str):
+        """Delete the files in a directory that were not written since the dataset was opened."""
+        if self.hashed:
+            paths = [path for path in self._mapping(f"{directory}/") if path.startswith(f"{directory}/")]
+        else:
+            paths = [
+                str(PurePosixPath(directory, file.name)) for file in (self.out_dir / directory).glob("*")
+                if file.is_file() and not file.name.endswith((".gz", ".br"))
+            ]
+        for path in paths:
+            if path not in self._written:
+                self.delete(path)
+
+    def finish(self):
+        """Write the manifest of a hashed dataset, after all other files.
+
+        It may also be called during a run as a checkpoint, so the files written so far can be found again.
+        """
+        if not self.hashed:
+            return
+        packages_index = json.dumps(dict(sorted(self._packages.items())), separators=(",", ":")).encode()
+        packages_path = _hashed_path("packages-index.json", packages_index)
+        if not (self.out_dir / packages_path).exists():
+            self._write_file(packages_path, packages_index)
+        manifest = self._read_manifest()
+        if manifest is not None and manifest.packages not in (None, packages_path):
+            self._delete_file(manifest.packages)
+        manifest = DatasetManifest(files=dict(sorted(self._files.items())), packages=packages_path)
+        # the manifest itself keeps its name, it has to be revalidated on every visit
+        self._write_file(MANIFEST_PATH, manifest.model_dump_json().encode())
+
+def store_path(ref: str) -> str:
+    return f"{STORE_DIR}/{ref[:2]}/{ref}.json"
+
+def _write_store(dataset: Dataset, data: bytes) -> str:
+    ref = hashlib.sha256(data).hexdigest()
+    dataset.write(store_path(ref), data, content_addressed=True)
+    return ref
+
+def write_attestations(dataset: Dataset, attestations: list[Attestation]) -> str:
+    """Write attestations to the store unless identical ones are already there, and return their ref.
+
+    Statements get store entries of their own, which the dashboard only loads when one is viewed.
+    """
+    attestations = [
+        a.model_copy(update={"statement": None, "statement_ref": _write_store(dataset, to_json(a.statement))})
+        if a.statement is not None else a
+        for a in attestations
+    ]
+    return _write_store(dataset, _ATTESTATIONS.dump_json(attestations, exclude_none=True))
+
+# attestation fields that are only stored in full, in the store
+_FULL_ATTESTATION_FIELDS = [name for name in Attestation.model_fields if name not in ("issuer", "error_code")]
+
+def _slim_artifact(dataset: Dataset, artifact: Artifact) -> Artifact | dict:
+    # the issuer and error code are all the overview and the dependency tree need
+    if all(getattr(a, name) is None for a in artifact.attestations for name in _FULL_ATTESTATION_FIELDS):
+        # nothing else to store, e.g. missing attestations
+        return artifact
+    slim = {
+        "name": artifact.name,
+        "hash": artifact.hash,
+        "attestations": [
+            {name: value for name, value in (("issuer", a.issuer), ("error_code", a.error_code)) if value is not None}
+            for a in artifact.attestations
+        ],
+        "attestations_ref": write_attestations(dataset, artifact.attestations),
+    }
+    if artifact.skipped is not None:
+        slim["skipped"] = artifact.skipped
+    return slim
+
+def write_package_info(dataset: Dataset, filename: str, package_info: PackageInfo):
+    """Write the package info of a server, moving its attestations to the shared store of the dataset.
+
+    The models are serialized as they are, with plain dicts in place of the parts that differ
+    in the file, instead of building and validating a slim copy of all packages first.
+    """
+    # exclude_none only applies to the models, None values are left out of the dicts here
+    fields = {name: getattr(package_info, name) for name in PackageInfo.model_fields if getattr(package_info, name) is not None}
+    fields["format_version"] = PACKAGE_INFO_FORMAT_VERSION
+    fields["packages"] = {
+        pkg_name: {
+            "type": pkg.type,
+            **({"name": pkg.name} if pkg.name is not None else {}),
+            "version": pkg.version,
+            "artifacts": [_slim_artifact(dataset, artifact) for artifact in pkg.artifacts],
+            "dependencies": pkg.dependencies,
+        }
+        for pkg_name, pkg in package_info.packages.items()
+    }
+    # the same serializer and format as model_dump_json(exclude_none=True)
+    dataset.write(f"{PACKAGES_DIR}/{filename}", to_json(fields, indent=dataset.indent, exclude_none=True))
+
+def load_package_info(dataset: Dataset, filename: str) -> PackageInfo:
+    """Load the package info of a server with the full attestations from the store of the dataset.
+
+    Raises FileNotFoundError if the file or one of its store entries is missing.
+    """
+    package_info = PackageInfo.model_validate_json(dataset.read(f"{PACKAGES_DIR}/{filename}"))
+    for pkg in package_info.packages.values():
+        for artifact in pkg.artifacts:
+            if artifact.attestations_ref is not None:
+                artifact.attestations = _ATTESTATIONS.validate_json(dataset.read(store_path(artifact.attestations_ref)))
+                artifact.attestations_ref = None
+                for attestation in artifact.attestations:
+                    if attestation.statement_ref is not None:
+                        attestation.statement = json.loads(dataset.read(store_path(attestation.statement_ref)))
+                        attestation.statement_ref = None
+    return package_info
@@ -0,0 +1,59 @@
+from collections import deque
+from collections.abc import Callable
+
+from .models import DependencyGraph, PackageInfo, PackageName, Packages
+
+def build_dependency_graph(packages: Packages, root: PackageName,
+                           normalize_name: Callable[[str], str]=str) -> DependencyGraph | None:
+    """Build the graph of packages reachable from root, with each package stored once.
+
+    Dependencies that are not in packages are skipped, cycles are kept as edges.
+    """
+    if root not in packages:
+        # not found, edge case
+        return None
+
+    names = {normalize_name(name): name for name in packages}
+    ids: dict[PackageName, int] = {root: 0}
+    nodes: list[PackageName] = [root]
+    edges: list[list[int]] = [[]]
+
+    queue = deque([root])
+    while queue:
+        name = queue.popleft()
+        node_edges = edges[ids[name]]
+        for dep in packages[name].dependencies:
+            dep_name = names.get(normalize_name(dep))
+            if dep_name is None:
+                continue
+            dep_id = ids.get(dep_name)
+            if dep_id is None:
+                dep_id = len(nodes)
+                ids[dep_name] = dep_id
+                nodes.append(dep_name)
+                edges.append([])
+                queue.append(dep_name)
+            if dep_id not in node_edges:
+                node_edges.append(dep_id)
+
+    return DependencyGraph(nodes=nodes, edges=edges)
+
+def print_dependency_graph(package_info: PackageInfo, indent=0):
+    assert package_info.graph is not None
+    graph = package_info.graph
+    printed: set[int] = set()
+
+    def print_node(node_id: int, indent: int):
+        name = graph.nodes[node_id]
+        pkg = package_info.packages[name]
+        prefix = " " * indent
+        if node_id in printed:
+            # like npm ls, show the dependencies of a package only once
+            print(f"{prefix}{name}=={pkg.version} (*)")
+            return
+        printed.add(node_id)
+        print(f"{prefix}{name}=={pkg.version} ({len(pkg.artifacts)} artifacts)")
+        for dep_id in graph.edges[node_id]:
+            print_node(dep_id, indent + 2)
+
+    print_node(0, indent)
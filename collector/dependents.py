@@ -0,0 +1,180 @@
+from collections.abc import Iterable
+from pathlib import Path
+import argparse
+import json
+
+from packaging.utils import canonicalize_name
+from pydantic import ValidationError
+
+from .dataset import Dataset, package_info_filename
+from .models import PackageDependents, PackageInfo
+
+DEPENDENTS_PATH = "dependents.json"
+
+# when servers report different errors for a package version, e.g. because one of them checked it
+# while the registry was unreachable, the most severe one counts
+_ERROR_SEVERITY = {"transient": 0, "missing": 1, "verification": 2}
+
+def package_key(registry: str, name: str, version: str) -> str:
+    return f"{registry}:{name}@{version}"
+
+def _attestation_error(package_info: PackageInfo, pkg_name: str) -> str | None:
+    return next((a.error_code for f in package_info.packages[pkg_name].artifacts for a in f.attestations if a.error_code), None)
+
+class DependentsIndex:
+    """Reverse index from each package version to the MCP servers that depend on it, across a dataset.
+
+    Like SummaryIndex, servers can be added, replaced and removed one at a time, without
+    reading the package info files of the other servers. A server depends on all packages
+    in its package info, including its own. Attestation errors are kept per server, as each
+    server's package info has its own results for the package versions it depends on.
+    """
+
+    def __init__(self):
+        self._packages: dict[str, set[str]] = {}  # server -> package keys
+        self._dependents: dict[str, set[str]] = {}  # package key -> servers
+        self._versions: dict[str, set[str]] = {}  # <registry>:<name> -> versions
+        self._errors: dict[str, dict[str, str]] = {}  # package key -> server -> attestation error code
+
+    @classmethod
+    def load(cls, dataset: Dataset, path: str=DEPENDENTS_PATH) -> "DependentsIndex":
+        index = cls()
+        try:
+            data = PackageDependents.model_validate_json(dataset.read(path))
+        except FileNotFoundError:
+            return index
+        except ValidationError as e:
+            # e.g. written by an older version, sync adds all servers again
+            print(f"Rebuilding {path}, it is invalid: {e}")
+            return index
+        for key, server_ids in data.packages.items():
+            index._add_package(key, (data.servers[server_id] for server_id in server_ids))
+        for key, server_errors in data.errors.items():
+            index._errors[key] = {data.servers[server_id]: error for server_id, error in server_errors.items()}
+        return index
+
+    def __len__(self) -> int:
+        return len(self._packages)
+
+    def _add_package(self, key: str, servers: Iterable[str]):
+        dependents = self._dependents.setdefault(key, set())
+        for server in servers:
+            dependents.add(server)
+            self._packages.setdefault(server, set()).add(key)
+        name, _, version = key.rpartition("@")
+        self._versions.setdefault(name, set()).add(version)
+
+    def add(self, package_info: PackageInfo):
+        """Add or replace the packages a server depends on."""
+        registry = package_info.packages[package_info.name].type
+        server = f"{registry}:{package_info.name}"
+        self.remove(server)
+        for pkg_name, pkg in package_info.packages.items():
+            key = package_key(registry, pkg.name or pkg_name, pkg.version)
+            self._add_package(key, [server])
+            error = _attestation_error(package_info, pkg_name)
+            if error is not None:
+                self._errors.setdefault(key, {})[server] = error
+
+    def remove(self, server: str):
+        for key in self._packages.pop(server, ()):
+            dependents = self._dependents[key]
+            dependents.discard(server)
+            errors = self._errors.get(key)
+            if errors is not None:
+                errors.pop(server, None)
+                if not errors:
+                    del self._errors[key]
+            if not dependents:
+                del self._dependents[key]
+                name, _, version = key.rpartition("@")
+                self._versions[name].discard(version)
+                if not self._versions[name]:
+                    del self._versions[name]
+
+    def update(self, other: "DependentsIndex"):
+        """Add or replace the servers of another index, e.g. of a shard."""
+        for server, keys in other._packages.items():
+            self.remove(server)
+            for key in keys:
+                self._add_package(key, [server])
+                error = other._errors.get(key, {}).get(server)
+                if error is not None:
+                    self._errors.setdefault(key, {})[server] = error
+
+    def sync(self, json_files: dict[str, Path]):
+        """Drop servers of removed package info files and add files not in the index yet.
+
+        json_files maps the file names of the package info files to their paths.
+        """
+        filenames = {package_info_filename(*server.split(":", 1)): server for server in self._packages}
+        for filename in filenames.keys() - json_files.keys():
+            self.remove(filenames[filename])
+        for filename in sorted(json_files.keys() - filenames.keys()):
+            print(f"Indexing dependencies of {filename}...")
+            self.add(PackageInfo.model_validate_json(json_files[filename].read_bytes()))
+
+    def dependents(self, registry: str, name: str, version: str | None=None) -> dict[str, list[str]]:
+        """Get the servers depending on a version of a package, or on each of its versions, by package key."""
+        versions = [version] if version is not None else sorted(self._versions.get(f"{registry}:{name}", ()))
+        return {
+            key: sorted(self._dependents[key])
+            for key in (package_key(registry, name, version) for version in versions)
+            if key in self._dependents
+        }
+
+    def error(self, key: str) -> str | None:
+        """Get the attestation error code of a package version, None if its provenance is valid or was not checked.
+
+        If the servers depending on it report different errors, the most severe one is returned.
+        """
+        errors = self._errors.get(key)
+        if not errors:
+            return None
+        return max(errors.values(), key=lambda error: _ERROR_SEVERITY.get(error, len(_ERROR_SEVERITY)))
+
+    def write(self, dataset: Dataset, path: str=DEPENDENTS_PATH):
+        servers = sorted(self._packages)
+        server_ids = {server: server_id for server_id, server in enumerate(servers)}
+        out = PackageDependents(
+            servers=servers,
+            packages={key: sorted(server_ids[server] for server in self._dependents[key]) for key in sorted(self._dependents)},
+            errors={
+                key: dict(sorted((server_ids[server], error) for server, error in self._errors[key].items()))
+                for key in sorted(self._errors)
+            },
+        )
+        # minified regardless of the output format, it lists every package of every server
+        dataset.write(path, out.model_dump_json())
+
+def main():
+    parser = argparse.ArgumentParser(description="List the MCP servers depending on a package")
+    parser.add_argument("registry", choices=["npm", "pypi"], help="Registry of the package")
+    parser.add_argument("name", help="Name of the package")
+    parser.add_argument("version", nargs="?", help="Version of the package (default: all versions)")
+    parser.add_argument("--data", default=Path("web/data"), type=Path, help="Dataset directory")
+    parser.add_argument("--without-provenance", action="store_true",
+                        help="Only list versions without valid provenance, e.g. with missing attestations")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    index = DependentsIndex.load(Dataset.open(args.data))
+    name = canonicalize_name(args.name) if args.registry == "pypi" else args.name
+    result = {
+        key: {"error": index.error(key), "servers": servers}
+        for key, servers in index.dependents(args.registry, name, args.version).items()
+        if not args.without_provenance or index.error(key) is not None
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    if not result:
+        print(f"No MCP server depends on {args.registry}:{name}{'@' + args.version if args.version else ''}")
+    for key, entry in result.items():
+        status = f"attestations {entry['error']}" if entry["error"] is not None else "no attestation errors"
+        print(f"{key} ({status}), {len(entry['servers'])} servers:")
+        for server in entry["servers"]:
+            print(f"  {server}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import asyncio
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable, Iterable
+from typing import TypeVar
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .instrumentation import instrumentation
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_HOST_CONCURRENCY = 8
+DEFAULT_MAX_WORKERS = 32
+DEFAULT_RETRIES = 4
+
+# responses of an overloaded or rate limiting host, retried with backoff
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+_RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+RETRY_BACKOFF = 1.0  # seconds before the first retry, doubled for each further one
+MAX_RETRY_AFTER = 300.0
+# responses slower than this multiple of the fastest one mean the host is saturated
+LATENCY_TOLERANCE = 3.0
+LATENCY_SMOOTHING = 0.2
+
+# responses that are definite answers and worth replaying
+_CACHEABLE_STATUS_CODES = (200, 404)
+_CACHED_HEADERS = ("content-type", "etag", "last-modified")
+
+T = TypeVar("T")
+
+class OfflineCacheMiss(requests.ConnectionError):
+    pass
+
+def _retry_after(response: requests.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+def _backoff(attempt: int) -> float:
+    # exponential backoff with jitter, so retries of concurrent requests spread out
+    delay = RETRY_BACKOFF * 2 ** attempt
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class HostLimiter:
+    """Concurrency limit of a host, adapted to its responses.
+
+    The limit starts at max_limit. It is halved when the host throttles or fails, at most once
+    per round trip, and grows by one per limit's worth of responses while their latency is close
+    to the fastest seen (additive increase, multiplicative decrease). Retry-After pauses all
+    requests to the host.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._paused_until = 0.0
+        self._min_latency: float | None = None
+        self._latency: float | None = None
+        self._last_decrease = 0.0
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._in_flight < int(self.limit):
+                    break
+                self._condition.wait(pause if pause > 0 else None)
+            self._in_flight += 1
+
+    def abandon(self):
+        """Release a slot without adapting the limit, e.g. after an invalid request."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def release(self, latency: float | None, throttled: bool=False, retry_after: float | None=None):
+        """Release a slot, with the latency of a successful response or None if the request failed."""
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if throttled or latency is None:
+                # responses to requests sent before the decrease don't count again
+                if now - self._last_decrease > (self._latency or 1.0):
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self._min_latency = latency if self._min_latency is None else min(self._min_latency, latency)
+                self._latency = latency if self._latency is None else (1 - LATENCY_SMOOTHING) * self._latency + LATENCY_SMOOTHING * latency
+                if self._latency <= LATENCY_TOLERANCE * self._min_latency:
+                    self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class HttpClient:
+    """Shared HTTP client with keep-alive connection pools and an adaptive concurrency limit per host.
+
+    Connection errors, timeouts and throttling or server error responses are retried with backoff.
+
+    With a cache directory, responses are persisted and revalidated with conditional requests.
+    In offline mode, only cached responses are served.
+    """
+
+    def __init__(self):
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._cache_dir: Path | None = None
+        self.offline = False
+        self.cache_hits = 0
+        self.cache_revalidated = 0
+        self.cache_misses = 0
+        self._host_stats: dict[str, dict[str, float]] = {}
+        self.configure()
+
+    def configure(self, timeout: float=DEFAULT_TIMEOUT, host_concurrency: int=DEFAULT_HOST_CONCURRENCY,
+                  host_limits: dict[str, int] | None=None, url_overrides: dict[str, str] | None=None,
+                  retries: int=DEFAULT_RETRIES):
+        """Configure the client.
+
+        host_concurrency and host_limits are the maximum concurrency, see HostLimiter.
+        url_overrides maps URL prefixes like "https://pypi.org" to the prefix to request instead, e.g. a
+        local mirror. Host limits and cache entries still apply to the original URLs.
+        """
+        self.timeout = timeout
+        self.host_concurrency = host_concurrency
+        self.host_limits = dict(host_limits or {})
+        self.url_overrides = dict(url_overrides or {})
+        self.retries = retries
+        with self._lock:
+            self._limiters: dict[str, HostLimiter] = {}
+        # one pool per host, large enough that requests within the host limit never wait for a connection
+        pool_maxsize = max([host_concurrency, *self.host_limits.values()])
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def configure_cache(self, cache_dir: Path | None, offline: bool=False):
+        if offline and cache_dir is None:
+            raise ValueError("Offline mode requires a cache directory")
+        self._cache_dir = cache_dir / "http" if cache_dir is not None else None
+        self.offline = offline
+
+    def _limiter(self, host: str) -> HostLimiter:
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostLimiter(self.host_limits.get(host, self.host_concurrency))
+                self._limiters[host] = limiter
+            return limiter
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        if self._cache_dir is None:
+            return self._get(url, **kwargs)
+
+        host = urlsplit(url).hostname or ""
+        headers = dict(kwargs.pop("headers", None) or {})
+        # the same URL may be served in different formats, e.g. abbreviated npm packuments
+        key = hashlib.sha256(f"{url}\0{headers.get('Accept', '')}".encode()).hexdigest()
+        cached = self._read_cache(key)
+
+        if self.offline:
+            if cached is None:
+                raise OfflineCacheMiss(f"No cached response for {url}")
+            self._count(host, "cache_hits")
+            return self._cached_response(url, *cached)
+
+        if cached is not None:
+            meta, _ = cached
+            if "etag" in meta["headers"]:
+                headers["If-None-Match"] = meta["headers"]["etag"]
+            if "last-modified" in meta["headers"]:
+                headers["If-Modified-Since"] = meta["headers"]["last-modified"]
+
+        response = self._get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self._count(host, "cache_revalidated")
+            return self._cached_response(url, *cached)
+
+        self._count(host, "cache_misses")
+        if response.status_code in _CACHEABLE_STATUS_CODES:
+            self._write_cache(key, url, response)
+        return response
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        host = urlsplit(url).hostname or ""
+        kwargs.setdefault("timeout", self.timeout)
+        for prefix, replacement in self.url_overrides.items():
+            if url.startswith(prefix):
+                url = replacement + url[len(prefix):]
+                break
+        limiter = self._limiter(host)
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            start = perf_counter()
+            try:
+                response = self._session.get(url, **kwargs)
+            except BaseException as e:
+                # any error releases the slot, otherwise the host would eventually block forever
+                if isinstance(e, _RETRY_EXCEPTIONS):
+                    limiter.release(None)
+                else:
+                    limiter.abandon()
+                self._count(host, "errors")
+                if not isinstance(e, _RETRY_EXCEPTIONS) or attempt == self.retries:
+                    raise
+                delay = _backoff(attempt)
+                print(f"Retrying {url} in {delay:.1f}s: {e}")
+                self._count(host, "retries")
+                time.sleep(delay)
+                continue
+
+            elapsed = perf_counter() - start
+            throttled = response.status_code in _RETRY_STATUS_CODES
+            retry_after = _retry_after(response) if throttled else None
+            limiter.release(elapsed, throttled=throttled, retry_after=retry_after)
+            self._count(host, "requests")
+            self._count(host, "bytes", len(response.content))
+            self._count(host, "seconds", elapsed)
+            if not throttled or attempt == self.retries:
+                return response
+
+            self._count(host, "throttled")
+            self._count(host, "retries")
+            # with Retry-After, the limiter holds back all requests to the host
+            delay = 0.0 if retry_after is not None else _backoff(attempt)
+            print(f"Retrying {url} in {retry_after or delay:.1f}s: HTTP {response.status_code}")
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _count(self, host: str, counter: str, value: float=1):
+        with self._lock:
+            host_stats = self._host_stats.setdefault(host, {})
+            host_stats[counter] = host_stats.get(counter, 0) + value
+            if counter.startswith("cache_"):
+                setattr(self, counter, getattr(self, counter) + value)
+
+    def host_stats(self) -> dict[str, dict[str, float]]:
+        """Requests, bytes, seconds, retries and cache counters of each host, and its final concurrency limit."""
+        with self._lock:
+            return {
+                host: {
+                    **{counter: round(value, 3) for counter, value in sorted(stats.items())},
+                    **({"limit": round(self._limiters[host].limit, 1)} if host in self._limiters else {}),
+                }
+                for host, stats in sorted(self._host_stats.items())
+            }
+
+    def _cache_path(self, key: str) -> Path:
+        assert self._cache_dir is not None
+        return self._cache_dir / key[:2] / f"{key}.response"
+
+    def _read_cache(self, key: str) -> tuple[dict, bytes] | None:
+        try:
+            meta, body = self._cache_path(key).read_bytes().split(b"\n", 1)
+        except FileNotFoundError:
+            return None
+        return json.loads(meta), body
+
+    def _write_cache(self, key: str, url: str, response: requests.Response):
+        path = self._cache_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in _CACHED_HEADERS if name in response.headers},
+        }
+        # the metadata on the first line, followed by the body, so that a single replace writes both
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(json.dumps(meta).encode() + b"\n" + response.content)
+        tmp_path.replace(path)
+
+    def _cached_response(self, url: str, meta: dict, body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = get_encoding_from_headers(response.headers) or "utf-8"
+        response._content = body
+        response.url = url
+        return response
+
+http_client = HttpClient()
+
+# One pool of threads per nesting level of run_concurrently: calls running on a pool may make
+# nested run_concurrently calls, which would deadlock if they waited for threads of their own pool.
+_executors: list[ThreadPoolExecutor] = []
+_executors_lock = threading.Lock()
+_nesting = threading.local()
+
+def _executor(depth: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        while len(_executors) <= depth:
+            _executors.append(ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS,
+                                                 thread_name_prefix=f"run_concurrently-{len(_executors)}"))
+        return _executors[depth]
+
+@atexit.register
+def shutdown_executors():
+    """Shut down the threads of run_concurrently, which are otherwise shared for the life of the process."""
+    with _executors_lock:
+        for executor in _executors:
+            executor.shutdown(cancel_futures=True)
+        _executors.clear()
+
+def run_concurrently(calls: Iterable[Callable[[], T]], max_workers: int=DEFAULT_MAX_WORKERS) -> list[T]:
+    """Run blocking calls concurrently on an asyncio event loop and return their results in order.
+
+    The calls run on threads shared by all run_concurrently calls of the process, so concurrent
+    callers together use at most DEFAULT_MAX_WORKERS threads per nesting level, and each caller
+    at most max_workers. HTTP requests made by the calls are still subject to the per-host limits
+    of the shared client.
+    """
+    # the calls count towards the stage they are made in
+    calls = [instrumentation.propagate(call) for call in calls]
+    depth = getattr(_nesting, "depth", 0)
+    executor = _executor(depth)
+
+    def run_nested(call: Callable[[], T]) -> T:
+        _nesting.depth = depth + 1
+        try:
+            return call()
+        finally:
+            _nesting.depth = depth
+
+    async def run_all() -> list[T]:
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(max_workers)
+
+        async def run(call: Callable[[], T]) -> T:
+            async with limit:
+                # like asyncio.to_thread, with the context of the caller
+                return await loop.run_in_executor(executor, contextvars.copy_context().run, run_nested, call)
+        return await asyncio.gather(*(run(call) for call in calls))
+    return asyncio.run(run_all())
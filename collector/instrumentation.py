@@ -0,0 +1,259 @@
+import contextvars
+import subprocess
+import sys
+import threading
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter, process_time, thread_time
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+T = TypeVar("T")
+
+PROFILE_INTERVAL = 0.01
+
+class Timing(BaseModel):
+    count: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+
+class RunReport(BaseModel):
+    started_at: str
+    wall_s: float
+    cpu_s: float  # all threads of the collector process
+    peak_rss_mb: float | None = None
+    subprocess_peak_rss_mb: float | None = None  # largest of npm and poetry
+    stages: dict[str, Timing]
+    subprocesses: dict[str, Timing]
+    http: dict[str, dict[str, float]]  # host -> request counts, bytes and time
+    caches: dict[str, dict[str, int]]  # cache -> hits and misses
+    servers: dict[str, dict[str, Timing]]  # MCP server -> stage -> timing
+
+def _sum_timings(timings: Iterable[dict[str, Timing]]) -> dict[str, Timing]:
+    total: dict[str, Timing] = {}
+    for stage_timings in timings:
+        for name, timing in stage_timings.items():
+            sum_timing = total.setdefault(name, Timing())
+            sum_timing.count += timing.count
+            sum_timing.wall_s = round(sum_timing.wall_s + timing.wall_s, 3)
+            sum_timing.cpu_s = round(sum_timing.cpu_s + timing.cpu_s, 3)
+    return dict(sorted(total.items()))
+
+def _sum_counters(counters: Iterable[dict[str, dict]]) -> dict[str, dict]:
+    total: dict[str, dict] = {}
+    for named_counters in counters:
+        for name, values in named_counters.items():
+            sum_values = total.setdefault(name, {})
+            for counter, value in values.items():
+                sum_values[counter] = round(sum_values.get(counter, 0) + value, 3)
+    return dict(sorted(total.items()))
+
+def merge_run_reports(reports: list[RunReport]) -> RunReport:
+    """Combine the reports of shards that ran in parallel, e.g. for the server costs of the next run."""
+    peak_rss = [report.peak_rss_mb for report in reports if report.peak_rss_mb is not None]
+    subprocess_peak_rss = [report.subprocess_peak_rss_mb for report in reports if report.subprocess_peak_rss_mb is not None]
+    servers: dict[str, dict[str, Timing]] = {}
+    for report in reports:
+        servers.update(report.servers)
+    return RunReport(
+        started_at=min(report.started_at for report in reports),
+        wall_s=max(report.wall_s for report in reports),
+        cpu_s=round(sum(report.cpu_s for report in reports), 3),
+        peak_rss_mb=max(peak_rss, default=None),
+        subprocess_peak_rss_mb=max(subprocess_peak_rss, default=None),
+        stages=_sum_timings(report.stages for report in reports),
+        subprocesses=_sum_timings(report.subprocesses for report in reports),
+        http=_sum_counters(report.http for report in reports),
+        caches=_sum_counters(report.caches for report in reports),
+        servers=dict(sorted(servers.items())),
+    )
+
+class _ActiveStage:
+    def __init__(self, label: str):
+        self.label = label  # path of nested stages, e.g. "server;attestations"
+        self.worker_cpu = 0.0
+
+_active_stage: contextvars.ContextVar[_ActiveStage | None] = contextvars.ContextVar("active_stage", default=None)
+_active_server: contextvars.ContextVar[str | None] = contextvars.ContextVar("active_server", default=None)
+
+def _peak_rss_mb(children: bool=False) -> float | None:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class SamplingProfiler:
+    """Samples the stacks of threads running a stage, in the collapsed format of flame graph tools.
+
+    Samples are taken at wall-clock intervals, so time spent waiting, e.g. for HTTP responses, shows up too.
+    """
+
+    def __init__(self, thread_labels: dict[int, str], interval: float=PROFILE_INTERVAL):
+        self._thread_labels = thread_labels
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.samples: Counter[str] = Counter()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            for ident, frame in sys._current_frames().items():
+                label = self._thread_labels.get(ident)
+                if label is None:
+                    continue
+                stack: list[str] = []
+                while frame is not None:
+                    stack.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join([label, *reversed(stack)])] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path):
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items())))
+
+class Instrumentation:
+    """Wall and CPU time of the stages of a run, in total and per MCP server.
+
+    The CPU time of a stage is that of its thread plus the threads of run_concurrently calls made in it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = datetime.now(timezone.utc)
+        self._start_wall = perf_counter()
+        self._start_cpu = process_time()
+        self._stages: dict[str, Timing] = {}
+        self._subprocesses: dict[str, Timing] = {}
+        self._servers: dict[str, dict[str, Timing]] = {}
+        self._thread_labels: dict[int, str] = {}
+        self._profiler: SamplingProfiler | None = None
+
+    @staticmethod
+    def _add(timings: dict[str, Timing], name: str, wall: float, cpu: float):
+        timing = timings.setdefault(name, Timing())
+        timing.count += 1
+        timing.wall_s += wall
+        timing.cpu_s += cpu
+
+    def _set_thread_label(self, label: str | None) -> str | None:
+        ident = threading.get_ident()
+        with self._lock:
+            previous = self._thread_labels.get(ident)
+            if label is None:
+                self._thread_labels.pop(ident, None)
+            else:
+                self._thread_labels[ident] = label
+        return previous
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        parent = _active_stage.get()
+        active = _ActiveStage(name if parent is None else f"{parent.label};{name}")
+        token = _active_stage.set(active)
+        previous_label = self._set_thread_label(active.label)
+        wall, cpu = perf_counter(), thread_time()
+        try:
+            yield
+        finally:
+            wall = perf_counter() - wall
+            cpu = thread_time() - cpu
+            _active_stage.reset(token)
+            self._set_thread_label(previous_label)
+            server = _active_server.get()
+            with self._lock:
+                self._add(self._stages, name, wall, cpu + active.worker_cpu)
+                if server is not None:
+                    self._add(self._servers.setdefault(server, {}), name, wall, cpu + active.worker_cpu)
+                # the thread CPU time of nested stages is already part of their parent's
+                if parent is not None:
+                    parent.worker_cpu += active.worker_cpu
+
+    @contextmanager
+    def server(self, name: str) -> Iterator[None]:
+        """Attribute the stages in this context to an MCP server, which is timed as the "server" stage."""
+        token = _active_server.set(name)
+        try:
+            with self.stage("server"):
+                yield
+        finally:
+            _active_server.reset(token)
+
+    def propagate(self, call: Callable[[], T]) -> Callable[[], T]:
+        """Wrap a call that runs in another thread, so it counts towards the current stage."""
+        active = _active_stage.get()
+        if active is None:
+            return call
+
+        def run() -> T:
+            previous_label = self._set_thread_label(active.label)
+            cpu = thread_time()
+            try:
+                return call()
+            finally:
+                cpu = thread_time() - cpu
+                self._set_thread_label(previous_label)
+                with self._lock:
+                    active.worker_cpu += cpu
+        return run
+
+    def run_subprocess(self, args: list[str], **kwargs) -> subprocess.CompletedProcess:
+        """Run a command like subprocess.run and record its duration."""
+        wall = perf_counter()
+        try:
+            return subprocess.run(args, **kwargs)
+        finally:
+            wall = perf_counter() - wall
+            with self._lock:
+                # the CPU time of concurrent subprocesses can't be told apart, only the peak RSS is reported
+                self._add(self._subprocesses, " ".join(args[:2]), wall, 0.0)
+
+    def start_profiler(self, interval: float=PROFILE_INTERVAL):
+        self._profiler = SamplingProfiler(self._thread_labels, interval)
+        self._profiler.start()
+
+    def stop_profiler(self, path: Path):
+        if self._profiler is None:
+            return
+        self._profiler.stop()
+        self._profiler.write(path)
+        print(f"Wrote {sum(self._profiler.samples.values())} profile samples to {path}")
+        self._profiler = None
+
+    def report(self, http: dict[str, dict[str, float]], caches: dict[str, dict[str, int]]) -> RunReport:
+        def rounded(timings: dict[str, Timing]) -> dict[str, Timing]:
+            return {
+                name: Timing(count=timing.count, wall_s=round(timing.wall_s, 3), cpu_s=round(timing.cpu_s, 3))
+                for name, timing in sorted(timings.items())
+            }
+
+        with self._lock:
+            return RunReport(
+                started_at=self._started_at.isoformat(timespec="seconds"),
+                wall_s=round(perf_counter() - self._start_wall, 3),
+                cpu_s=round(process_time() - self._start_cpu, 3),
+                peak_rss_mb=_peak_rss_mb(),
+                subprocess_peak_rss_mb=_peak_rss_mb(children=True),
+                stages=rounded(self._stages),
+                subprocesses=rounded(self._subprocesses),
+                http=http,
+                caches=caches,
+                servers={server: rounded(timings) for server, timings in sorted(self._servers.items())},
+            )
+
+instrumentation = Instrumentation()
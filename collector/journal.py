@@ -0,0 +1,107 @@
+import threading
+from collections.abc import Collection
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TextIO
+
+from pydantic import BaseModel, ValidationError
+
+from .models import MCPServer
+
+# resolved  dependencies resolved and locked
+# verified  attestations verified, or previous results reused
+# written   package info written to the dataset
+# failed    processing raised an error, retried by --resume up to max_attempts times
+JOURNAL_STATES = ("resolved", "verified", "written", "failed")
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+class JournalEntry(BaseModel):
+    server: str
+    state: str
+    time: str
+    attempts: int = 0  # failed attempts so far
+    reason: str | None = None  # error of the last failed attempt
+    filename: str | None = None  # package info file, once written
+
+def server_key(mcp_server: MCPServer) -> str:
+    return f"{mcp_server.package_registry}:{mcp_server.package_name}"
+
+class Journal:
+    """Progress of each MCP server in a run, appended to a JSON lines file so an interrupted run can be resumed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file: TextIO | None = None
+        self._previous: dict[str, JournalEntry] = {}
+        self._entries: dict[str, JournalEntry] = {}
+        self.max_attempts = DEFAULT_MAX_ATTEMPTS
+
+    def configure(self, path: Path | None, resume: bool=False, max_attempts: int=DEFAULT_MAX_ATTEMPTS):
+        """Start a new journal at path, or continue the one there if resume is set."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.max_attempts = max_attempts
+        self._previous = {}
+        if path is None:
+            self._entries = {}
+            return
+
+        if resume and path.exists():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = JournalEntry.model_validate_json(line)
+                    except ValidationError:
+                        continue  # the last line may be incomplete if the run was killed
+                    self._previous[entry.server] = entry
+        self._entries = dict(self._previous)
+
+        # compact to the latest entry of each server
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text("".join(entry.model_dump_json(exclude_none=True) + "\n" for entry in self._entries.values()),
+                            encoding="utf-8")
+        tmp_path.replace(path)
+        self._file = path.open("a", encoding="utf-8")
+
+    def record(self, mcp_server: MCPServer, state: str, reason: str | None=None, filename: str | None=None):
+        if self._file is None:
+            return
+        key = server_key(mcp_server)
+        with self._lock:
+            previous = self._entries.get(key)
+            entry = JournalEntry(
+                server=key,
+                state=state,
+                time=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                attempts=(previous.attempts if previous is not None else 0) + (state == "failed"),
+                reason=reason,
+                filename=filename or (previous.filename if previous is not None else None),
+            )
+            self._entries[key] = entry
+            self._file.write(entry.model_dump_json(exclude_none=True) + "\n")
+            self._file.flush()
+
+    def pending(self, mcp_server: MCPServer, package_files: Collection[str]) -> bool:
+        """Check whether a resumed run still has to process a server.
+
+        Servers are done if their package info was written and is still in the dataset,
+        or if they failed max_attempts times.
+        """
+        entry = self._previous.get(server_key(mcp_server))
+        if entry is None:
+            return True
+        match entry.state:
+            case "written":
+                return entry.filename not in package_files
+            case "failed":
+                if entry.attempts >= self.max_attempts:
+                    print(f"Skipping {entry.server}, failed {entry.attempts} times: {entry.reason}")
+                    return False
+                return True
+            case _:
+                return True
+
+journal = Journal()
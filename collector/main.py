@@ -1,114 +1,396 @@
 from tempfile import TemporaryDirectory
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from collections.abc import Callable, Iterable, Iterator
+from functools import lru_cache, partial
 import traceback
+import json
+import shutil
 import subprocess
 from pathlib import Path
 import argparse
 
-from .mcp_registry_downloader import download_registry
-from .mcp_registry_sanitizer import sanitize_registry
+from pydantic import ValidationError
+
+from .mcp_registry_downloader import iter_registry, read_registry_snapshot
+from .mcp_registry_sanitizer import iter_mcp_servers
 from .pypi_package_info import get_pypi_package_info
-from .pypi_attestations import verify_pypi_attestations_from_dist_filename_and_hash
+from .pypi_attestations import verify_pypi_attestations_batch
 from .npm_package_info import get_npm_package_info
 from .npm_attestations import verify_npm_attestations
-from .summarize import summarize_package_infos
-from .models import MCPServer, PackageInfo
+from .npm_resolver import packument_cache
+from .instrumentation import RunReport, instrumentation
+from .journal import DEFAULT_MAX_ATTEMPTS, journal, server_key
+from .sharding import Shard, load_server_costs, parse_shard, select_shard
+from .resolvers import RESOLVERS
+from .summarize import SummaryIndex, summarize_package_info
+from .dependents import DependentsIndex
+from .dataset import OUTPUT_FORMATS, PACKAGES_DIR, RUN_REPORT_PATH, Dataset, load_package_info, package_info_filename, write_package_info
+from .attestation_cache import attestation_cache
+from .artifact_selection import ARTIFACT_POLICIES, DEFAULT_SAMPLE_SIZE, artifact_selection, parse_tags
+from .http_client import DEFAULT_HOST_CONCURRENCY, DEFAULT_RETRIES, DEFAULT_TIMEOUT, http_client, run_concurrently
+from .models import PACKAGE_INFO_FORMAT_VERSION, MCPServer, PackageInfo, Packages, Artifact, Attestation
+
+# servers written between checkpoints of a hashed dataset, whose package files are only known from its manifest
+CHECKPOINT_INTERVAL = 25
+
+@lru_cache(maxsize=None)
+def open_previous_dataset(previous_dir: Path) -> Dataset:
+    return Dataset.open(previous_dir)
+
+def load_previous_package_info(previous_dir: Path, mcp_server: MCPServer) -> PackageInfo | None:
+    filename = package_info_filename(mcp_server.package_registry, mcp_server.package_name)
+    try:
+        return load_package_info(open_previous_dataset(previous_dir), filename)
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, ValidationError) as e:
+        # e.g. written by an interrupted run, or in an older format
+        print(f"Ignoring previous results for {mcp_server.package_name}, {filename} is invalid: {e}")
+        return None
+
+def has_same_resolution(previous: Packages, current: Packages) -> bool:
+    """Check whether two resolved dependency sets contain the same packages, versions and artifacts."""
+    if previous.keys() != current.keys():
+        return False
+    for pkg_name, pkg in current.items():
+        previous_pkg = previous[pkg_name]
+        if (pkg.version != previous_pkg.version
+                or pkg.dependencies != previous_pkg.dependencies
+                or [(a.name, a.hash, a.skipped) for a in pkg.artifacts] != [(a.name, a.hash, a.skipped) for a in previous_pkg.artifacts]):
+            return False
+    return True
 
-def process_npm_mcp_server(mcp_server: MCPServer, tmp_dir: Path) -> PackageInfo:
+def has_transient_errors(package_info: PackageInfo) -> bool:
+    """Check whether some attestations could not be checked, so previous results shouldn't be reused."""
+    return any(attestation.error_code == "transient"
+               for pkg in package_info.packages.values()
+               for artifact in pkg.artifacts
+               for attestation in artifact.attestations)
+
+def can_reuse(previous: PackageInfo | None, package_info: PackageInfo, mcp_server: MCPServer) -> bool:
+    """Check whether the previous results of a server are still valid for its current resolution."""
+    return (previous is not None
+            and previous.format_version == PACKAGE_INFO_FORMAT_VERSION
+            # the repository is checked against the provenance of the server's package
+            and previous.repo_url == mcp_server.repo_url
+            and previous.graph == package_info.graph
+            and has_same_resolution(previous.packages, package_info.packages)
+            and not has_transient_errors(previous))
+
+def process_npm_mcp_server(mcp_server: MCPServer, tmp_dir: Path, previous: PackageInfo | None=None, resolver: str="builtin") -> PackageInfo:
     mcp_pkg_name = mcp_server.package_name
     print(f"Processing MCP server: {mcp_pkg_name} from NPM")
     tmp_dir = tmp_dir / f"npm_{mcp_pkg_name.replace('/', '@')}"
     package_info = get_npm_package_info(
         mcp_pkg_name,
         "*",
-        tmp_dir
+        tmp_dir,
+        resolver
     )
 
+    journal.record(mcp_server, "resolved")
+
+    if can_reuse(previous, package_info, mcp_server):
+        print(f"Reusing previous results for {mcp_pkg_name}, resolved dependencies are unchanged")
+        journal.record(mcp_server, "verified")
+        return previous
+
     # fetch attestations
     pkgs = package_info.packages
+    artifacts: list[Artifact] = []
+    calls: list[Callable[[], list[Attestation]]] = []
     for pkg_name, pkg in pkgs.items():
         if pkg_name == mcp_pkg_name:
             expected_repository_url = mcp_server.repo_url
         else:
             expected_repository_url = None
         for artifact_info in pkg.artifacts:
-            artifact_hash = artifact_info.hash
-            out = verify_npm_attestations(pkg_name, pkg.version, artifact_hash, expected_repository_url)
-            print(f"Attestations for {artifact_info.name}: {out}")
-            artifact_info.attestations = out
+            artifacts.append(artifact_info)
+            calls.append(partial(verify_npm_attestations, pkg.name or pkg_name, pkg.version, artifact_info.hash, expected_repository_url))
+
+    with instrumentation.stage("attestations"):
+        outs = run_concurrently(calls)
+    for artifact_info, out in zip(artifacts, outs):
+        print(f"Attestations for {artifact_info.name}: {out}")
+        artifact_info.attestations = out
+    journal.record(mcp_server, "verified")
 
     return package_info
 
-def process_pypi_mcp_server(mcp_server: MCPServer, tmp_dir: Path) -> PackageInfo:
+def process_pypi_mcp_server(mcp_server: MCPServer, tmp_dir: Path, previous: PackageInfo | None=None, resolver: str="builtin") -> PackageInfo:
     mcp_pkg_name = mcp_server.package_name
     print(f"Processing MCP server: {mcp_pkg_name} from PyPI")
     tmp_dir = tmp_dir / f"pypi_{mcp_pkg_name}"
     package_info = get_pypi_package_info(
         mcp_pkg_name,
         "*",
-        tmp_dir
+        tmp_dir,
+        resolver
     )
+    selected_artifacts = {pkg_name: artifact_selection.apply(pkg.artifacts) for pkg_name, pkg in package_info.packages.items()}
+    journal.record(mcp_server, "resolved")
 
-    # fetch attestations
+    if can_reuse(previous, package_info, mcp_server):
+        print(f"Reusing previous results for {mcp_pkg_name}, resolved dependencies are unchanged")
+        journal.record(mcp_server, "verified")
+        return previous
+
+    # fetch attestations, all files of a release are verified together
     pkgs = package_info.packages
+    batches: list[list[Artifact]] = []
+    calls: list[Callable[[], list[list[Attestation]]]] = []
     for pkg_name, pkg in pkgs.items():
-        if pkg_name == mcp_pkg_name:
+        if pkg_name == package_info.name:
             expected_repository_url = mcp_server.repo_url
         else:
             expected_repository_url = None
-        for artifact_info in pkg.artifacts:
-            out = verify_pypi_attestations_from_dist_filename_and_hash(artifact_info.name, artifact_info.hash, expected_repository_url)
+        artifacts = selected_artifacts[pkg_name]
+        if artifacts:
+            batches.append(artifacts)
+            dists = [(artifact_info.name, artifact_info.hash) for artifact_info in artifacts]
+            calls.append(partial(verify_pypi_attestations_batch, dists, expected_repository_url))
+
+    with instrumentation.stage("attestations"):
+        batch_outs = run_concurrently(calls)
+    for artifacts, outs in zip(batches, batch_outs):
+        for artifact_info, out in zip(artifacts, outs):
             print(f"Attestations for {artifact_info.name}: {out}")
             artifact_info.attestations = out
+    journal.record(mcp_server, "verified")
 
     return package_info
 
-def build_dataset(tmp_dir: Path, out_dir: Path, limit: int | None=None):
-    registry_path = tmp_dir / "registry.json"
-    download_registry(registry_path)
-    registry = sanitize_registry(registry_path)
-
-    pkg_out_dir = out_dir / "packages"
-    pkg_out_dir.mkdir(parents=True, exist_ok=True)
+def process_mcp_server(mcp_server: MCPServer, tmp_dir: Path, previous_dir: Path | None=None, resolver: str="builtin") -> PackageInfo | None:
+    """Process a single MCP server, returning None if it is unsupported or failed.
 
-    for mcp_server in registry.servers:
-        try:
+    If previous_dir is given, the previous results for the server are reused when its
+    resolved dependencies have not changed. The lock files in tmp_dir are deleted
+    unless processing fails.
+    """
+    # npm would reuse the lock file of an earlier attempt
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        with instrumentation.server(server_key(mcp_server)):
+            previous = None
+            if previous_dir is not None:
+                with instrumentation.stage("previous"):
+                    previous = load_previous_package_info(previous_dir, mcp_server)
             match mcp_server.package_registry:
                 case "npm":
-                    package_info = process_npm_mcp_server(mcp_server, tmp_dir)
+                    package_info = process_npm_mcp_server(mcp_server, tmp_dir, previous, resolver)
                 case "pypi":
-                    package_info = process_pypi_mcp_server(mcp_server, tmp_dir)
+                    package_info = process_pypi_mcp_server(mcp_server, tmp_dir, previous, resolver)
                 case _:
+                    return None
+        package_info.description = mcp_server.description
+        package_info.repo_url = mcp_server.repo_url
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return package_info
+    except subprocess.CalledProcessError as e:
+        print(f"Error processing {mcp_server.package_name}: {e}")
+        journal.record(mcp_server, "failed", reason=str(e))
+        return None
+    except Exception as e:
+        print(f"Error processing {mcp_server.package_name}: {e}")
+        traceback.print_exc()
+        journal.record(mcp_server, "failed", reason=f"{type(e).__name__}: {e}")
+        return None
+
+def process_mcp_servers(servers: Iterable[MCPServer], tmp_dir: Path, jobs: int=1, limit: int | None=None,
+                        previous_dir: Path | None=None, resolver: str="builtin") -> Iterator[tuple[int, MCPServer, PackageInfo]]:
+    """Yield (index, server, package info) for each successfully processed server.
+
+    With jobs > 1, results are yielded in completion order. No more servers are in flight
+    than successes still needed for the limit, so the same servers succeed as in a serial run.
+    """
+    indexed_servers = enumerate(servers)
+
+    if jobs <= 1:
+        for idx, mcp_server in indexed_servers:
+            if limit is not None and limit <= 0:
+                break
+            package_info = process_mcp_server(mcp_server, tmp_dir / "servers" / str(idx), previous_dir, resolver)
+            if package_info is None:
+                continue
+            if limit is not None:
+                limit -= 1
+            yield idx, mcp_server, package_info
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending: dict[Future[PackageInfo | None], tuple[int, MCPServer]] = {}
+        while True:
+            max_pending = jobs if limit is None else min(jobs, limit)
+            while len(pending) < max_pending and (item := next(indexed_servers, None)) is not None:
+                idx, mcp_server = item
+                future = executor.submit(process_mcp_server, mcp_server, tmp_dir / "servers" / str(idx), previous_dir, resolver)
+                pending[future] = (idx, mcp_server)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, mcp_server = pending.pop(future)
+                package_info = future.result()
+                if package_info is None:
                     continue
+                if limit is not None:
+                    limit -= 1
+                yield idx, mcp_server, package_info
 
-            out_path = pkg_out_dir / f"{mcp_server.package_registry}_{package_info.name.replace('/', '@')}.json"
-            out_path.write_text(package_info.model_dump_json(indent=1))
+def build_dataset(tmp_dir: Path, out_dir: Path, limit: int | None=None, jobs: int=1, previous_dir: Path | None=None,
+                  resolver: str="builtin", registry_path: Path | None=None, output_format: str="plain",
+                  update_registry: bool=True, shard: Shard | None=None, shard_costs: dict[str, float] | None=None):
+    """Collect the package info of the MCP servers in the registry into a dataset in out_dir.
 
-        except subprocess.CalledProcessError as e:
-            print(f"Error processing {mcp_server.package_name}: {e}")
-            continue
-        except Exception as e:
-            print(f"Error processing {mcp_server.package_name}: {e}")
-            traceback.print_exc()
+    Unless update_registry is False, the registry snapshot at registry_path is updated first.
+    With a shard, only its part of the servers is collected, see select_shard.
+    """
+    if registry_path is None:
+        registry_path = tmp_dir / "registry.jsonl"
+    dataset = Dataset(out_dir, hashed=output_format == "hashed")
+    package_files = dataset.package_files()
+
+    # servers are processed while the registry is still being downloaded, except when sharding,
+    # which needs all of them. A resumed run skips those the journal has as done.
+    servers: Iterable[MCPServer] = iter_mcp_servers(iter_registry(registry_path) if update_registry else read_registry_snapshot(registry_path))
+    if shard is not None:
+        servers = select_shard(servers, shard, shard_costs or {})
+        # servers this shard collected in an earlier run may be assigned to another shard now, their
+        # files are left out so the merge does not pick up stale copies
+        selected = {package_info_filename(mcp_server.package_registry, mcp_server.package_name) for mcp_server in servers}
+        for filename in package_files.keys() - selected:
+            dataset.delete(f"{PACKAGES_DIR}/{filename}")
+        package_files = dataset.package_files()
+    servers = (mcp_server for mcp_server in servers if journal.pending(mcp_server, package_files))
+
+    # start from the summaries of the package info files already in the output directory
+    with instrumentation.stage("summary"):
+        summary_index = SummaryIndex.load(dataset)
+        summary_index.sync(package_files)
+        dependents_index = DependentsIndex.load(dataset)
+        dependents_index.sync(package_files)
+
+    # the registry may list the same package more than once, keep the last one like a serial run
+    written: dict[str, int] = {}
+    for idx, mcp_server, package_info in process_mcp_servers(servers, tmp_dir, jobs, limit, previous_dir, resolver):
+        filename = package_info_filename(mcp_server.package_registry, package_info.name)
+        if written.get(filename, -1) > idx:
+            journal.record(mcp_server, "written", filename=filename)
             continue
+        with instrumentation.stage("write"):
+            write_package_info(dataset, filename, package_info)
+            written[filename] = idx
+            summary_index.add(summarize_package_info(package_info))
+            dependents_index.add(package_info)
+        journal.record(mcp_server, "written", filename=filename)
+        if dataset.hashed and len(written) % CHECKPOINT_INTERVAL == 0:
+            # a resumed run only knows the package files listed by the manifest
+            dataset.finish()
 
-        if limit is not None:
-            limit -= 1
-            if limit <= 0:
-                break
+    with instrumentation.stage("summary"):
+        summary_index.write(dataset)
+        summary_index.write_shards(dataset)
+        dependents_index.write(dataset)
+    dataset.write(RUN_REPORT_PATH, build_run_report().model_dump_json(indent=dataset.indent))
+    dataset.finish()
+
+def build_run_report() -> RunReport:
+    return instrumentation.report(
+        http=http_client.host_stats(),
+        caches={
+            "http": {"hits": http_client.cache_hits, "revalidated": http_client.cache_revalidated, "misses": http_client.cache_misses},
+            "attestations": {"hits": attestation_cache.hits, "misses": attestation_cache.misses},
+            "packuments": {"hits": packument_cache.hits, "misses": packument_cache.misses},
+        },
+    )
 
-    summarize_package_infos(pkg_out_dir, out_dir / "summary.json")
-       
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--out", default=Path("web/data"), type=Path, help="Output directory")
     parser.add_argument("--dev", action="store_true", help="Development mode (limit to 2 packages)")
+    parser.add_argument("--jobs", default=1, type=int, help="Number of MCP servers to process in parallel")
+    parser.add_argument("--cache-dir", default=Path(".cache"), type=Path, help="Directory for caches persisted across runs")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the persistent cache")
+    parser.add_argument("--offline", action="store_true", help="Serve all HTTP requests from the cache, fail on cache misses")
+    parser.add_argument("--resolver", default="builtin", choices=RESOLVERS,
+                        help="Dependency resolver: builtin (in-process), external (npm/poetry), or validate (compare both)")
+    parser.add_argument("--http-timeout", default=DEFAULT_TIMEOUT, type=float, help="Timeout in seconds for HTTP requests")
+    parser.add_argument("--host-concurrency", default=DEFAULT_HOST_CONCURRENCY, type=int, help="Maximum concurrent HTTP requests per host")
+    parser.add_argument("--host-limit", action="append", default=[], metavar="HOST=N", help="Maximum concurrent HTTP requests for a specific host")
+    parser.add_argument("--http-retries", default=DEFAULT_RETRIES, type=int,
+                        help="Retries of HTTP requests that fail, time out or are throttled by the host")
+    parser.add_argument("--incremental", action="store_true", help="Reuse previous results of servers whose resolved dependencies are unchanged")
+    parser.add_argument("--output-format", default="plain", choices=OUTPUT_FORMATS,
+                        help="plain (pretty-printed JSON) or hashed (minified and compressed JSON under content-hashed names)")
+    parser.add_argument("--pypi-artifacts", default="all", choices=ARTIFACT_POLICIES,
+                        help="Which files of each PyPI release to verify: all, minimal (sdist and one wheel), "
+                             "compatible (wheels matching --pypi-tags) or sample (--pypi-sample-size files)")
+    parser.add_argument("--pypi-tags", type=parse_tags,
+                        help="Comma-separated wheel tags for --pypi-artifacts compatible (default: CPython 3.13 on Linux, Windows and macOS)")
+    parser.add_argument("--pypi-sample-size", default=DEFAULT_SAMPLE_SIZE, type=int, help="Files per release for --pypi-artifacts sample")
+    parser.add_argument("--previous", type=Path, help="Previous dataset for --incremental (default: output directory)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run: skip servers that were written, retry failed ones up to --max-attempts times")
+    parser.add_argument("--max-attempts", default=DEFAULT_MAX_ATTEMPTS, type=int, help="Attempts per server for --resume")
+    parser.add_argument("--registry", type=Path, metavar="PATH",
+                        help="Use this registry snapshot as is instead of downloading the registry, e.g. the same one for all shards")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="Only collect the I-th of N parts of the servers, balanced by their processing time in the run report "
+                             "of --previous, which has to be the same merged dataset for all shards")
+    parser.add_argument("--profile", nargs="?", const=Path("profile.folded"), type=Path, metavar="PATH",
+                        help="Sample the stacks of all stages and write them in the collapsed format of flame graph tools (default: profile.folded)")
     args = parser.parse_args()
 
+    if args.offline and args.no_cache:
+        parser.error("--offline requires the cache")
+    if args.resume and args.no_cache:
+        parser.error("--resume requires the cache")
+    if not args.no_cache:
+        attestation_cache.configure(args.cache_dir)
+        packument_cache.configure(args.cache_dir)
+        http_client.configure_cache(args.cache_dir, offline=args.offline)
+
+    host_limits: dict[str, int] = {}
+    for host_limit in args.host_limit:
+        host, _, n = host_limit.partition("=")
+        host_limits[host] = int(n)
+    http_client.configure(timeout=args.http_timeout, host_concurrency=args.host_concurrency, host_limits=host_limits,
+                        retries=args.http_retries)
+
+    artifact_selection.configure(args.pypi_artifacts, tags=args.pypi_tags, sample_size=args.pypi_sample_size)
+
     limit = 2 if args.dev else None
 
-    with TemporaryDirectory(dir=".", delete=False) as tmp_dir:
-        build_dataset(Path(tmp_dir), out_dir=args.out, limit=limit)
+    if args.profile is not None:
+        instrumentation.start_profiler()
+    with TemporaryDirectory() as tmp_dir:
+        # the run directory holds the journal and the lock files of failed servers until the next run
+        if args.no_cache:
+            run_dir = Path(tmp_dir)
+        else:
+            # shards running on the same machine each have their own journal
+            run_dir = args.cache_dir / ("run" if args.shard is None else f"run-{args.shard.index + 1}-of-{args.shard.count}")
+            if not args.resume:
+                shutil.rmtree(run_dir, ignore_errors=True)
+            journal.configure(run_dir / "journal.jsonl", resume=args.resume, max_attempts=args.max_attempts)
+        previous_dir = (args.previous or args.out) if args.incremental else None
+        if args.registry is not None:
+            registry_path = args.registry
+        else:
+            registry_path = None if args.no_cache else args.cache_dir / "registry.jsonl"
+        shard_costs = None
+        if args.shard is not None:
+            # all shards need the same costs to agree on the assignment, the output of a shard only has its own servers
+            if args.previous is not None:
+                shard_costs = load_server_costs(args.previous)
+            else:
+                print("No --previous dataset, assigning servers to shards without their processing times")
+        build_dataset(run_dir, out_dir=args.out, limit=limit, jobs=args.jobs, previous_dir=previous_dir,
+                      resolver=args.resolver, registry_path=registry_path, output_format=args.output_format,
+                      update_registry=args.registry is None, shard=args.shard, shard_costs=shard_costs)
+    if args.profile is not None:
+        instrumentation.stop_profiler(args.profile)
 
 
 if __name__ == "__main__":
@@ -1,30 +1,126 @@
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-import requests
+from urllib.parse import urlencode
 import json
 
+from .http_client import http_client
+
 
 BASE_URL = "https://registry.modelcontextprotocol.io/v0/servers"
+PAGE_LIMIT = 100
+# servers removed from the registry instead of being marked as deleted are not among the
+# updated entries, so the snapshot is downloaded in full again after this long
+FULL_SYNC_INTERVAL = timedelta(days=7)
+
+_OFFICIAL_META = "io.modelcontextprotocol.registry/official"
+
+def _official_meta(entry: dict) -> dict:
+    return entry.get("_meta", {}).get(_OFFICIAL_META, {})
+
+def _entry_key(entry: dict) -> str:
+    meta = _official_meta(entry)
+    entry_id = meta.get("versionId") or meta.get("id")
+    if entry_id:
+        return entry_id
+    version = entry.get("version") or entry.get("version_detail", {}).get("version")
+    return f"{entry.get('name')}@{version}"
+
+def _entry_updated_at(entry: dict) -> str | None:
+    meta = _official_meta(entry)
+    return meta.get("updatedAt") or meta.get("updated_at")
+
+def _is_deleted(entry: dict) -> bool:
+    # older entries have the status at the top level
+    return (_official_meta(entry).get("status") or entry.get("status")) == "deleted"
 
-def download_registry(out_path = Path("registry.json")):
-    servers = []
-    limit = 100
-    url = f"{BASE_URL}?limit={limit}"
+def _full_sync_path(snapshot_path: Path) -> Path:
+    return snapshot_path.with_name(snapshot_path.name + ".full-sync")
 
-    response = requests.get(url)
-    response.raise_for_status()
-    j = response.json()
-    servers.extend(j["servers"])
+def _last_full_sync(snapshot_path: Path) -> datetime | None:
+    try:
+        return datetime.fromisoformat(_full_sync_path(snapshot_path).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
 
-    while cursor := j["metadata"].get("next_cursor"):
-        url = f"{BASE_URL}?limit={limit}&cursor={cursor}"
-        response = requests.get(url)
+def _fetch_entries(updated_since: str | None=None) -> Iterator[dict]:
+    params = {"limit": PAGE_LIMIT}
+    if updated_since is not None:
+        params["updated_since"] = updated_since
+    cursor = None
+    while True:
+        url = f"{BASE_URL}?{urlencode(params if cursor is None else {**params, 'cursor': cursor})}"
+        response = http_client.get(url)
         response.raise_for_status()
         j = response.json()
-        servers.extend(j["servers"])
+        yield from j["servers"]
+        metadata = j.get("metadata", {})
+        cursor = metadata.get("next_cursor") or metadata.get("nextCursor")
+        if not cursor:
+            break
+
+def read_registry_snapshot(path: Path) -> Iterator[dict]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_registry(snapshot_path: Path, full_sync_interval: timedelta=FULL_SYNC_INTERVAL) -> Iterator[dict]:
+    """Yield the registry entries while writing them to a snapshot file, one JSON entry per line.
+
+    If a previous snapshot exists, only entries updated since its newest entry are downloaded,
+    unless the last full download is older than full_sync_interval. Otherwise, entries are
+    yielded page by page as they arrive. Deleted entries are dropped. The snapshot is only
+    replaced once all entries have been yielded.
+    """
+    previous: dict[str, dict] = {}
+    if snapshot_path.exists():
+        previous = {_entry_key(entry): entry for entry in read_registry_snapshot(snapshot_path)}
+    updated_at = [_entry_updated_at(entry) for entry in previous.values()]
+    last_full_sync = _last_full_sync(snapshot_path)
+    full_sync = (not previous or None in updated_at or last_full_sync is None
+                 or datetime.now(timezone.utc) - last_full_sync >= full_sync_interval)
+
+    if not full_sync:
+        updated_since = max(updated_at)
+        updates = {_entry_key(entry): entry for entry in _fetch_entries(updated_since)}
+        print(f"Reusing {len(previous)} registry entries, {len(updates)} updated since {updated_since}")
+        entries = (updates.pop(key, entry) for key, entry in previous.items())
+        new_entries = updates.values()
+    else:
+        if previous:
+            print(f"Downloading all registry entries, the last full download was at {last_full_sync}")
+        entries = _fetch_entries()
+        new_entries = []
+
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    deleted = 0
+    started_at = datetime.now(timezone.utc)
+    try:
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for entries_part in (entries, new_entries):
+                for entry in entries_part:
+                    if _is_deleted(entry):
+                        deleted += 1
+                        continue
+                    f.write(json.dumps(entry) + "\n")
+                    count += 1
+                    yield entry
+    except GeneratorExit:
+        # the consumer stopped early, keep the previous snapshot
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(snapshot_path)
+    if full_sync:
+        _full_sync_path(snapshot_path).write_text(started_at.isoformat())
 
-    out_path.write_text(json.dumps(servers, indent=2))
+    print(f"Downloaded {count} registry entries to {snapshot_path}, dropped {deleted} deleted entries")
 
-    print(f"Downloaded {url} to {out_path}")
+def download_registry(out_path = Path("registry.jsonl")):
+    for _ in iter_registry(out_path):
+        pass
 
 if __name__ == "__main__":
     download_registry()
@@ -1,13 +1,11 @@
-import json
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 from .models import MCPRegistry, MCPServer
+from .mcp_registry_downloader import read_registry_snapshot
 
-def sanitize_registry(path: Path) -> MCPRegistry:
-    data = json.loads(path.read_text())
-
-    servers: list[MCPServer] = []
-    for entry in data:
+def iter_mcp_servers(entries: Iterable[dict]) -> Iterator[MCPServer]:
+    for entry in entries:
         repo = entry.get("repository", {})
         packages = entry.get("packages", [])
         for pkg in packages:
@@ -15,18 +13,20 @@ def sanitize_registry(path: Path) -> MCPRegistry:
             if pkg_registry not in ("npm", "pypi"):
                 continue
 
-            servers.append(MCPServer(
+            yield MCPServer(
                 package_registry=pkg_registry,
                 package_name=pkg["identifier"],
                 repo_url=repo.get("url"),
                 description=entry.get("description", "")
-            ))
-    registry = MCPRegistry(servers=servers)
+            )
+
+def sanitize_registry(path: Path) -> MCPRegistry:
+    registry = MCPRegistry(servers=list(iter_mcp_servers(read_registry_snapshot(path))))
     return registry
 
 
 if __name__ == "__main__":
-    registry_path = Path("registry.json")
+    registry_path = Path("registry.jsonl")
     sanitized_registry = sanitize_registry(registry_path)
     out_path = Path("registry-clean.json")
     out_path.write_text(sanitized_registry.model_dump_json(indent=2))
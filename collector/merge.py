@@ -0,0 +1,59 @@
+from pathlib import Path
+import argparse
+
+from .dataset import OUTPUT_FORMATS, PACKAGES_DIR, RUN_REPORT_PATH, Dataset, load_package_info, write_package_info
+from .dependents import DependentsIndex
+from .instrumentation import RunReport, merge_run_reports
+from .summarize import SummaryIndex
+
+def merge_datasets(shard_dirs: list[Path], out_dir: Path, output_format: str="plain"):
+    """Combine the datasets written by the shards of a run into one.
+
+    Package files missing from all shards are removed from out_dir. If several shards
+    wrote the same package, the last one wins.
+    """
+    dataset = Dataset(out_dir, hashed=output_format == "hashed")
+    summary_index = SummaryIndex()
+    dependents_index = DependentsIndex()
+    reports: list[RunReport] = []
+    sources: dict[str, Path] = {}
+    for shard_dir in shard_dirs:
+        shard = Dataset.open(shard_dir)
+        for filename in sorted(shard.package_files()):
+            if filename in sources:
+                print(f"{filename} is in both {sources[filename]} and {shard_dir}, using {shard_dir}")
+            sources[filename] = shard_dir
+            # attestations are moved to the store of the merged dataset
+            write_package_info(dataset, filename, load_package_info(shard, filename))
+        summary_index.update(SummaryIndex.load(shard))
+        dependents_index.update(DependentsIndex.load(shard))
+        try:
+            reports.append(RunReport.model_validate_json(shard.read(RUN_REPORT_PATH)))
+        except FileNotFoundError:
+            print(f"No run report in {shard_dir}")
+    print(f"Merged {len(sources)} package files from {len(shard_dirs)} shards")
+
+    dataset.delete_unwritten(PACKAGES_DIR)
+    # summaries of shards missing their package files, e.g. from an older run
+    summary_index.sync(dataset.package_files())
+    summary_index.write(dataset)
+    summary_index.write_shards(dataset)
+    dependents_index.sync(dataset.package_files())
+    dependents_index.write(dataset)
+    if reports:
+        dataset.write(RUN_REPORT_PATH, merge_run_reports(reports).model_dump_json(indent=dataset.indent))
+    dataset.finish()
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the datasets of collector shards, see collector.main --shard")
+    parser.add_argument("shards", nargs="+", type=Path, help="Output directories of the shards")
+    parser.add_argument("--out", default=Path("web/data"), type=Path, help="Output directory")
+    parser.add_argument("--output-format", default="plain", choices=OUTPUT_FORMATS,
+                        help="plain (pretty-printed JSON) or hashed (minified and compressed JSON under content-hashed names)")
+    args = parser.parse_args()
+
+    merge_datasets(args.shards, args.out, args.output_format)
+
+
+if __name__ == "__main__":
+    main()
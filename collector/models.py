@@ -21,6 +21,10 @@ class Attestation(BaseModel):
     build_trigger: str | None = None
     run_url: str | None = None
     statement: dict | None = None
+    statement_ref: str | None = None  # key of the statement in the dataset store
+    # missing: no attestations published
+    # verification: attestations failed to verify
+    # transient: the registry could not be reached or was overloaded, checked again by the next run
     error_code: str | None = None
     error_msg: str | None = None
 
@@ -28,11 +32,14 @@ class Artifact(BaseModel):
     name: str  # artifact name
     hash: str  # hash of the artifact, e.g., sha256:<hex-hash>
     attestations: list[Attestation] = []
+    attestations_ref: str | None = None  # key of the full attestations in the dataset store
+    skipped: bool | None = None  # True if not verified because of the artifact selection policy
 
 PackageName = str
 
 class Package(BaseModel):
     type: str  # e.g., "npm", "pypi"
+    name: PackageName | None = None  # published name, if different from the key in Packages, e.g. name@version
     version: str
     artifacts: list[Artifact]
     dependencies: list[PackageName]
@@ -41,21 +48,48 @@ class DependencyTreeNode(BaseModel):
     name: PackageName
     dependencies: list['DependencyTreeNode'] = []
 
+class DependencyGraph(BaseModel):
+    nodes: list[PackageName]  # each package once, node 0 is the root package
+    edges: list[list[int]]  # dependencies of each node, as node indices
+
 Packages = dict[PackageName, Package]
 
+# 1: dependencies as a fully expanded tree
+# 2: dependencies as a graph
+# 3: full attestations in the dataset store, only issuer and error code inline
+# 4: statements of the attestations in separate store entries
+PACKAGE_INFO_FORMAT_VERSION = 4
+
 class PackageInfo(BaseModel):
+    format_version: int = 1
     name: PackageName
+    description: str = ""  # description of the MCP server in the registry
+    repo_url: str | None = None  # repository of the MCP server in the registry, expected in the provenance of its package
     packages: Packages
-    tree: DependencyTreeNode
+    tree: DependencyTreeNode | None = None
+    graph: DependencyGraph | None = None
 
 class PackageSummary(BaseModel):
     name: PackageName
     version: str
     type: str  # e.g., "npm", "pypi"
+    description: str = ""
     attestation_issuers: list[str] = []
     deps: int = 0  # number of dependencies
     has_error: bool = False
     deps_errors: int = 0  # number of dependencies with errors
+    skipped_artifacts: int = 0  # number of artifacts not verified because of the artifact selection policy
 
 class PackageSummaries(BaseModel):
     packages: list[PackageSummary] = []
+
+class SummaryManifest(BaseModel):
+    total: int  # number of packages
+    page_size: int
+    pages: list[str]  # paths of the summary pages relative to the manifest, sorted by package name
+    search_index: str  # path of the search index relative to the manifest
+
+class PackageDependents(BaseModel):
+    servers: list[str]  # MCP servers as <registry>:<name>
+    packages: dict[str, list[int]]  # <registry>:<name>@<version> -> indices of the servers depending on it
+    errors: dict[str, dict[int, str]] = {}  # <registry>:<name>@<version> -> index of a server -> attestation error code in its package info
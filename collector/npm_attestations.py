@@ -1,18 +1,19 @@
 import json
-from functools import lru_cache
+from urllib.parse import unquote
 
-import requests
 from sigstore.models import Bundle, InvalidBundle
 import sigstore.errors
-from sigstore.verify import Verifier
-from sigstore.dsse import Envelope as DsseEnvelope
 from pypi_attestations._impl import (
     _der_decode_utf8string,
     _FULCIO_CLAIMS_OIDS,
 )
-from pydantic_core import ValidationError
+
+import requests
 
 from .models import Attestation
+from .attestation_cache import attestation_cache
+from .http_client import http_client
+from .sigstore_verification import verify_dsse
 
 class DummyPolicy:
     def __init__(self):
@@ -21,21 +22,54 @@ class DummyPolicy:
     def verify(self, cert) -> None:
         pass
 
-@lru_cache(maxsize=None)
+def _check_subject(statement: dict, dist_filename: str, dist_hash: str):
+    expected_digest = dist_hash.removeprefix("sha512:")
+    if not isinstance(statement, dict):
+        raise sigstore.errors.VerificationError("invalid statement: not a JSON object")
+    for subject in statement.get("subject", []):
+        # scoped package names are percent-encoded in package URLs, e.g. pkg:npm/%40scope/name@1.0.0
+        if unquote(subject.get("name", "")) == dist_filename and subject.get("digest", {}).get("sha512") == expected_digest:
+            return
+    raise sigstore.errors.VerificationError(f"statement has no subject matching {dist_filename} with digest {dist_hash}")
+
+def _normalize_repository_url(url: str) -> str:
+    # e.g. git+https://github.com/Owner/repo.git -> github.com/owner/repo, host and repository names are case-insensitive
+    url = url.strip().removeprefix("git+").rstrip("/").removesuffix(".git")
+    return url.partition("://")[2].lower() if "://" in url else url.lower()
+
+def _check_repository_url(expected_repository_url: str, repo_url: str):
+    """Check that the provenance was built in the expected repository, like _check_repository_identity for PyPI."""
+    if _normalize_repository_url(repo_url) != _normalize_repository_url(expected_repository_url):
+        raise sigstore.errors.VerificationError(
+            f'provenance was built in repository "{repo_url}", expected "{expected_repository_url}"'
+        )
+
 def verify_npm_attestations(package_name: str, package_version: str, dist_hash: str, expected_repository_url: str | None) -> list[Attestation]:
     dist_filename = f"pkg:npm/{package_name}@{package_version}"
     if not dist_hash.startswith("sha512:"):
         raise RuntimeError(f"Unsupported hash format: {dist_hash}")
 
+    cache_key = attestation_cache.key("npm", dist_hash, expected_repository_url)
+    cached = attestation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     url = f"https://registry.npmjs.org/-/npm/v1/attestations/{package_name}@{package_version}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return [Attestation(
+    try:
+        response = http_client.get(url)
+    except requests.RequestException as e:
+        return [Attestation(error_code="transient", error_msg=str(e))]
+    if response.status_code == 404:
+        out = [Attestation(
             error_code="missing",
         )]
+        attestation_cache.put(cache_key, out)
+        return out
+    elif response.status_code != 200:
+        # not cached, the next run checks again
+        return [Attestation(error_code="transient", error_msg=f"HTTP {response.status_code}")]
     data = response.json()
 
-    verifier = Verifier.production()
     policy = DummyPolicy()
 
     out: list[Attestation] = []
@@ -47,25 +81,28 @@ def verify_npm_attestations(package_name: str, package_version: str, dist_hash:
         try:
             sigstore_bundle = Bundle.from_json(json.dumps(bundle))
         except (InvalidBundle, json.JSONDecodeError) as e:
-            return [Attestation(
+            out = [Attestation(
                 error_code="verification",
                 error_msg=f"Invalid Sigstore bundle: {e}"
             )]
+            attestation_cache.put(cache_key, out)
+            return out
 
-        # https://github.com/sigstore/sigstore-python/issues/1384
-        # try:
-        #     type_, payload = verifier.verify_dsse(sigstore_bundle, policy)
-        # except sigstore.errors.VerificationError as err:
-        #     raise VerificationError(str(err)) from err
+        try:
+            payload = verify_dsse(sigstore_bundle, policy)
+            try:
+                statement = json.loads(payload)
+            except json.JSONDecodeError as e:
+                raise sigstore.errors.VerificationError(f"invalid statement: {e}")
+            _check_subject(statement, dist_filename, dist_hash)
+        except sigstore.errors.VerificationError as e:
+            out = [Attestation(
+                error_code="verification",
+                error_msg=str(e),
+            )]
+            attestation_cache.put(cache_key, out)
+            return out
 
-        # if type_ != DsseEnvelope._TYPE:  # noqa: SLF001
-        #     raise VerificationError(f"expected JSON envelope, got {type_}")
-        
-        # try:
-        #     statement = _Statement.model_validate_json(payload)
-        # except ValidationError as e:
-        #     raise VerificationError(f"invalid statement: {str(e)}")
-        
         certificate = sigstore_bundle.signing_certificate
         cert_claims: dict[str, str] = {}
         for extension in certificate.extensions:
@@ -84,6 +121,16 @@ def verify_npm_attestations(package_name: str, package_version: str, dist_hash:
         build_config_digest = cert_claims["1.3.6.1.4.1.57264.1.19"]
         build_trigger = cert_claims["1.3.6.1.4.1.57264.1.20"]
         run_url = cert_claims["1.3.6.1.4.1.57264.1.21"]
+        if expected_repository_url is not None:
+            try:
+                _check_repository_url(expected_repository_url, repo_url)
+            except sigstore.errors.VerificationError as e:
+                out = [Attestation(
+                    error_code="verification",
+                    error_msg=str(e),
+                )]
+                attestation_cache.put(cache_key, out)
+                return out
         out.append(Attestation(
             issuer=issuer,
             runner_env=runner_env,
@@ -94,8 +141,9 @@ def verify_npm_attestations(package_name: str, package_version: str, dist_hash:
             build_config_digest=build_config_digest,
             build_trigger=build_trigger,
             run_url=run_url,
-            # statement=statement,
+            statement=statement,
         ))
+    attestation_cache.put(cache_key, out)
     return out
 
 if __name__ == "__main__":
@@ -121,4 +169,4 @@ if __name__ == "__main__":
         print(f"Build Config Digest: {attestation.build_config_digest}")
         print(f"Build Trigger: {attestation.build_trigger}")
         print(f"Run URL: {attestation.run_url}")
-        # print(f"  Statement: {attestation.statement}")
\ No newline at end of file
+        print(f"Statement: {attestation.statement}")
\ No newline at end of file
@@ -2,9 +2,13 @@ import json
 import subprocess
 from tempfile import TemporaryDirectory
 from pathlib import Path
-import base64
+import binascii
 
-from .models import Package, Artifact, DependencyTreeNode, Packages, PackageInfo
+from .models import PACKAGE_INFO_FORMAT_VERSION, Package, Artifact, Packages, PackageInfo
+from .instrumentation import instrumentation
+from .dependency_graph import build_dependency_graph, print_dependency_graph
+from .npm_resolver import ResolutionError, resolve_npm_lock
+from .resolvers import diff_packages
 
 def create_npm_lock(tmp_dir: Path, pkg_name: str, pkg_version: str) -> Path:
     package_json = {
@@ -19,95 +23,105 @@ def create_npm_lock(tmp_dir: Path, pkg_name: str, pkg_version: str) -> Path:
     with package_json_path.open("w", encoding="utf-8") as f:
         json.dump(package_json, f, indent=2)
 
-    subprocess.run(["npm", "install", "--package-lock-only"], cwd=tmp_dir, check=True, stdout=subprocess.DEVNULL)
+    instrumentation.run_subprocess(["npm", "install", "--package-lock-only"], cwd=tmp_dir, check=True, stdout=subprocess.DEVNULL)
 
     return tmp_dir / "package-lock.json"
 
 def parse_npm_lock(lockfile_path: Path) -> Packages:
-    lock_data = json.loads(lockfile_path.read_text())
+    return packages_from_npm_lock(json.loads(lockfile_path.read_bytes()))
+
+def _integrity_to_hash(integrity: str) -> str:
+    # convert npm integrity format <alg>-<b64-hash> to <alg>:<hex-hash>
+    algo, sep, b64 = integrity.partition("-")
+    if not sep:
+        return integrity  # fallback, unknown format
+    return f"{algo}:{binascii.a2b_base64(b64).hex()}"
+
+def _resolve_dependency(paths: dict[str, str], path: str, dep_name: str) -> str | None:
+    # like require(), look in the node_modules of the package and then in those of its ancestors
+    while True:
+        key = paths.get(f"{path}/node_modules/{dep_name}" if path else f"node_modules/{dep_name}")
+        if key is not None or not path:
+            return key
+        path = path.rpartition("/node_modules/")[0]
+
+def packages_from_npm_lock(lock_data: dict) -> Packages:
+    """Get the packages of a package-lock.json (lockfileVersion 2 or 3).
+
+    Packages are keyed by name, except for versions that are only installed nested below
+    another package, e.g. in node_modules/a/node_modules/b, which are keyed by name@version.
+    Dependencies are resolved from the location of each package like npm does.
+    """
+    entries = {path: meta for path, meta in lock_data.get("packages", {}).items() if path != ""}  # skip root entry
+
+    # the least nested copy of a package gets its name as key
+    paths: dict[str, str] = {}  # lock path -> key
+    versions: dict[str, str] = {}  # key -> version
+    for path in sorted(entries, key=lambda path: (path.count("node_modules/"), path)):
+        name = path.rpartition("node_modules/")[2]
+        version = entries[path]["version"]
+        key = name if versions.get(name, version) == version else f"{name}@{version}"
+        paths[path] = key
+        versions[key] = version
 
-    packages = lock_data.get("packages", {})
     result: Packages = {}
-
-    for path, meta in packages.items():
-        if path == "":
-            continue  # skip root entry
-
-        name = path.removeprefix("node_modules/")
-
-        # convert npm integrity format <alg>-<b64-hash> to <alg>:<hex-hash>
-        npm_hash = meta["integrity"]
-        if "-" in npm_hash:
-            algo, b64 = npm_hash.split("-", 1)
-            hex_hash = base64.b16encode(base64.b64decode(b64)).decode("ascii").lower()
-            artifact_hash = f"{algo}:{hex_hash}"
-        else:
-            artifact_hash = npm_hash  # fallback, unknown format
-
-        result[name] = Package(
+    for path, meta in entries.items():
+        key = paths[path]
+        if key in result:
+            continue  # another copy of the same version
+        install_name = path.rpartition("node_modules/")[2]
+        # aliases like "b": "npm:c@1.0.0" are installed as b but published as c
+        name = meta.get("name", install_name)
+        version = meta["version"]
+        result[key] = Package(
             type="npm",
-            version=meta["version"],
-            dependencies=list(meta.get("dependencies", {}).keys()),
+            name=name if name != key else None,
+            version=version,
+            dependencies=[_resolve_dependency(paths, path, dep_name) or dep_name for dep_name in meta.get("dependencies", ())],
             artifacts=[
-                Artifact(name=f"pkg:npm/{name}@{meta['version']}", hash=artifact_hash)
+                Artifact(name=f"pkg:npm/{name}@{version}", hash=_integrity_to_hash(meta["integrity"]))
             ],
         )
 
     return result
 
-def build_dependency_tree(dependency_map: Packages, package_name: str, visited: set[str] | None=None) -> DependencyTreeNode | None:
-    if visited is None:
-        visited = set()
-
-    if package_name not in dependency_map:
-        # not found, edge case
-        return None
-
-    if package_name in visited:
-        raise RuntimeError(f"Circular dependency detected for package {package_name}")
-
-    visited.add(package_name)
-
-    pkg = dependency_map[package_name]
-    dependencies: list[DependencyTreeNode] = []
-
-    for dep_name in pkg.dependencies:
-        subtree = build_dependency_tree(dependency_map, dep_name, visited.copy())
-        if subtree is not None:
-            dependencies.append(subtree)
-
-    node = DependencyTreeNode(
-        name=package_name,
-        dependencies=dependencies
-    )
-
-    return node
-
-def get_npm_package_info(pkg_name: str, pkg_version: str, tmp_dir: Path) -> PackageInfo:
+def lock_with_npm(pkg_name: str, pkg_version: str, tmp_dir: Path) -> Packages:
     tmp_dir.mkdir(parents=True, exist_ok=True)
     lockfile_path = create_npm_lock(tmp_dir, pkg_name, pkg_version)
-    dependencies = parse_npm_lock(lockfile_path)
-    tree = build_dependency_tree(dependencies, pkg_name)
-    assert tree is not None
+    return parse_npm_lock(lockfile_path)
+
+def get_npm_package_info(pkg_name: str, pkg_version: str, tmp_dir: Path, resolver: str="builtin") -> PackageInfo:
+    """Resolve and lock the dependencies of a package.
+
+    The builtin resolver falls back to npm if it cannot resolve a package. The
+    "external" resolver always uses npm, and "validate" compares both and reports differences.
+    """
+    with instrumentation.stage("resolution"):
+        if resolver == "external":
+            dependencies = lock_with_npm(pkg_name, pkg_version, tmp_dir)
+        else:
+            try:
+                dependencies = packages_from_npm_lock(resolve_npm_lock(pkg_name, pkg_version))
+            except ResolutionError as e:
+                print(f"Falling back to npm for {pkg_name}: {e}")
+                dependencies = lock_with_npm(pkg_name, pkg_version, tmp_dir)
+            else:
+                if resolver == "validate":
+                    differences = diff_packages(lock_with_npm(pkg_name, pkg_version, tmp_dir), dependencies)
+                    for difference in differences:
+                        print(f"Resolver difference for {pkg_name}: {difference}")
+    with instrumentation.stage("graph"):
+        graph = build_dependency_graph(dependencies, pkg_name)
+    assert graph is not None
     return PackageInfo(
+        format_version=PACKAGE_INFO_FORMAT_VERSION,
         name=pkg_name,
         packages=dependencies,
-        tree=tree,
+        graph=graph,
     )
 
 def print_dependency_tree(dependency_tree: PackageInfo, indent=0):
-    _print_dependency_tree(dependency_tree.tree, dependency_tree.packages, indent)
-
-def _print_dependency_tree(tree: DependencyTreeNode, packages: Packages, indent=0):
-    if tree is None:
-        return
-    prefix = " " * indent
-
-    pkg = packages[tree.name]
-    print(f"{prefix}{tree.name}=={pkg.version} ({len(pkg.artifacts)} artifacts)")
-
-    for dep in tree.dependencies:
-        _print_dependency_tree(dep, packages, indent + 2)
+    print_dependency_graph(dependency_tree, indent)
 
 if __name__ == "__main__":
     # Example usage
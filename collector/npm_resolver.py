@@ -0,0 +1,267 @@
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from urllib.parse import quote
+
+from .http_client import http_client
+from .npm_semver import InvalidRange, SemVer, is_valid_range, satisfies
+
+NPM_REGISTRY_URL = "https://registry.npmjs.org"
+
+# abbreviated metadata, which contains everything needed for installation
+_PACKUMENT_ACCEPT = "application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8, */*"
+
+# packuments of popular packages take megabytes, so only the most recently used are kept in memory
+PACKUMENT_MEMORY_SIZE = 1024
+
+class ResolutionError(Exception):
+    pass
+
+class PackumentCache:
+    """Packuments shared by all resolutions in the process, optionally persisted on disk for max_age seconds.
+
+    At most max_size packuments are kept in memory, evicting the least recently used.
+    """
+
+    def __init__(self, max_size: int=PACKUMENT_MEMORY_SIZE):
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._name_locks: dict[str, threading.Lock] = {}
+        self._dir: Path | None = None
+        self._max_age = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, cache_dir: Path | None, max_age: float=3600):
+        self._dir = cache_dir / "packuments" if cache_dir is not None else None
+        self._max_age = max_age
+
+    def get(self, name: str) -> dict:
+        with self._lock:
+            packument = self._memory.get(name)
+            if packument is not None:
+                self._memory.move_to_end(name)
+                self.hits += 1
+                return packument
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+
+        # fetch each packument only once, even if several servers need it at the same time
+        with name_lock:
+            with self._lock:
+                packument = self._memory.get(name)
+            if packument is None:
+                packument, cached = self._load(name)
+                with self._lock:
+                    self._memory[name] = packument
+                    if len(self._memory) > self._max_size:
+                        self._memory.popitem(last=False)
+                    self._name_locks.pop(name, None)
+                    if cached:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+            else:
+                with self._lock:
+                    self.hits += 1
+        return packument
+
+    def _load(self, name: str) -> tuple[dict, bool]:
+        # returns the packument and whether it came from the disk cache
+        path = self._dir / f"{quote(name, safe='')}.json" if self._dir is not None else None
+        if path is not None and path.exists() and time.time() - path.stat().st_mtime < self._max_age:
+            return json.loads(path.read_bytes()), True
+
+        response = http_client.get(f"{NPM_REGISTRY_URL}/{quote(name, safe='@')}", headers={"Accept": _PACKUMENT_ACCEPT})
+        if response.status_code == 404:
+            raise ResolutionError(f"Package '{name}' not found on npm")
+        response.raise_for_status()
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(response.content)
+            tmp_path.replace(path)
+        return response.json(), False
+
+packument_cache = PackumentCache()
+
+def _parse_spec(name: str, spec: str) -> tuple[str, str]:
+    """Split a dependency spec into the package to fetch and the version range or tag."""
+    if spec.startswith("npm:"):
+        # alias, e.g. "string-width-cjs": "npm:string-width@^4.2.0"
+        target = spec[len("npm:"):]
+        at = target.find("@", 1)
+        if at == -1:
+            return target, "*"
+        return target[:at], target[at + 1:] or "*"
+    return name, spec or "*"
+
+def pick_version(name: str, spec: str) -> tuple[str, dict]:
+    """Pick the version of a package that npm would install for a range or dist-tag."""
+    packument = packument_cache.get(name)
+    versions: dict[str, dict] = packument.get("versions", {})
+    dist_tags: dict[str, str] = packument.get("dist-tags", {})
+
+    if spec in dist_tags and not is_valid_range(spec):
+        version = dist_tags[spec]
+        if version not in versions:
+            raise ResolutionError(f"Tag '{spec}' of {name} points to unknown version {version}")
+        return version, versions[version]
+
+    try:
+        candidates = [
+            (semver, version) for version in versions
+            if (semver := SemVer.parse(version)) is not None and satisfies(semver, spec)
+        ]
+    except InvalidRange:
+        raise ResolutionError(f"Unsupported dependency spec for {name}: {spec}")
+    if not candidates:
+        raise ResolutionError(f"No version of {name} matches '{spec}'")
+
+    # like npm-pick-manifest: the latest tag if it matches, else the highest non-deprecated version
+    latest = dist_tags.get("latest")
+    if latest is not None and any(version == latest for _, version in candidates):
+        return latest, versions[latest]
+    not_deprecated = [candidate for candidate in candidates if not versions[candidate[1]].get("deprecated")]
+    _, version = max(not_deprecated or candidates)
+    return version, versions[version]
+
+def _integrity(manifest: dict) -> str | None:
+    dist = manifest.get("dist", {})
+    if "integrity" in dist:
+        return dist["integrity"]
+    if "shasum" in dist:
+        # old packages only have a sha1 hex digest, which npm converts to an integrity string
+        return "sha1-" + base64.b64encode(bytes.fromhex(dist["shasum"])).decode("ascii")
+    return None
+
+class _Node:
+    __slots__ = ("name", "version", "manifest", "parent", "children", "path")
+
+    def __init__(self, name: str, version: str, manifest: dict, parent: "_Node | None"):
+        self.name = name
+        self.version = version
+        self.manifest = manifest
+        self.parent = parent
+        self.children: dict[str, _Node] = {}
+        self.path = "" if parent is None else f"{parent.path + '/' if parent.path else ''}node_modules/{name}"
+
+def _dependencies(manifest: dict) -> list[tuple[str, str, bool]]:
+    """List (name, spec, optional) of the dependencies npm installs for a manifest."""
+    deps: dict[str, tuple[str, bool]] = {}
+    peer_meta = manifest.get("peerDependenciesMeta", {})
+    for name, spec in manifest.get("peerDependencies", {}).items():
+        if not peer_meta.get(name, {}).get("optional"):
+            deps[name] = (spec, False)
+    for name, spec in manifest.get("dependencies", {}).items():
+        deps[name] = (spec, False)
+    for name, spec in manifest.get("optionalDependencies", {}).items():
+        deps[name] = (spec, True)
+    return [(name, spec, optional) for name, (spec, optional) in sorted(deps.items())]
+
+def _find(node: _Node, name: str) -> _Node | None:
+    current: _Node | None = node
+    while current is not None:
+        if name in current.children:
+            return current.children[name]
+        current = current.parent
+    return None
+
+def _satisfies(node: _Node, fetch_name: str, range_or_tag: str) -> bool:
+    """Whether a placed package is the one a dependency spec asks for."""
+    if node.manifest.get("name", node.name) != fetch_name:
+        return False
+    semver = SemVer.parse(node.version)
+    return range_or_tag in ("", "*", "latest") or (semver is not None and is_valid_range(range_or_tag)
+                                                   and satisfies(semver, range_or_tag))
+
+def _shadows(top: _Node, child: _Node, resolved: set[_Node]) -> bool:
+    """Whether placing child below top would hide the version a resolved package in its subtree depends on."""
+    nodes = deque([top])
+    while nodes:
+        node = nodes.popleft()
+        if child.name in node.children:
+            # the subtree has its own copy
+            continue
+        if node in resolved:
+            for dep_name, spec, _ in _dependencies(node.manifest):
+                if dep_name == child.name and not _satisfies(child, *_parse_spec(dep_name, spec)):
+                    return True
+        nodes.extend(node.children.values())
+    return False
+
+def resolve_npm_lock(pkg_name: str, pkg_version: str) -> dict:
+    """Resolve the dependencies of a package like `npm install --package-lock-only` and return the lockfile data.
+
+    Dependencies are hoisted to the top-level node_modules. If that would conflict with an already
+    placed version, they are placed as high as possible below it on the path to the package that
+    requires them, without hiding it from packages that depend on it.
+    """
+    root = _Node("", "", {"dependencies": {pkg_name: pkg_version}}, None)
+    resolved: set[_Node] = set()
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        for dep_name, spec, optional in _dependencies(node.manifest):
+            fetch_name, range_or_tag = _parse_spec(dep_name, spec)
+            existing = _find(node, dep_name)
+            if existing is not None and _satisfies(existing, fetch_name, range_or_tag):
+                continue
+            try:
+                version, manifest = pick_version(fetch_name, range_or_tag)
+            except ResolutionError:
+                if optional:
+                    continue
+                raise
+            if existing is None:
+                parent = root
+            else:
+                # the ancestors between the package that requires it and the conflicting version, highest first
+                candidates: list[_Node] = []
+                current = node
+                while current is not existing.parent:
+                    candidates.insert(0, current)
+                    current = current.parent
+                parent = node
+                for candidate in candidates[:-1]:
+                    if not _shadows(candidate, _Node(dep_name, version, manifest, candidate), resolved):
+                        parent = candidate
+                        break
+            if dep_name in parent.children:
+                raise ResolutionError(f"Cannot place {dep_name}@{version} below '{parent.path}'")
+            child = _Node(dep_name, version, manifest, parent)
+            parent.children[dep_name] = child
+            queue.append(child)
+        resolved.add(node)
+
+    packages: dict[str, dict] = {"": {"name": "example-project", "version": "1.0.0", "dependencies": {pkg_name: pkg_version}}}
+    nodes = deque(root.children.values())
+    while nodes:
+        node = nodes.popleft()
+        manifest = node.manifest
+        entry: dict = {"version": node.version}
+        if manifest.get("name", node.name) != node.name:
+            entry["name"] = manifest["name"]
+        tarball = manifest.get("dist", {}).get("tarball")
+        if tarball is not None:
+            entry["resolved"] = tarball
+        integrity = _integrity(manifest)
+        if integrity is not None:
+            entry["integrity"] = integrity
+        for field in ("dependencies", "optionalDependencies", "peerDependencies"):
+            if manifest.get(field):
+                entry[field] = manifest[field]
+        packages[node.path] = entry
+        nodes.extend(node.children.values())
+
+    return {
+        "name": "example-project",
+        "version": "1.0.0",
+        "lockfileVersion": 3,
+        "requires": True,
+        "packages": dict(sorted(packages.items())),
+    }
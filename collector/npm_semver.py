@@ -0,0 +1,192 @@
+import re
+from functools import lru_cache, total_ordering
+
+# Port of the range semantics of node-semver, as used by npm to pick dependency versions.
+
+_VERSION_RE = re.compile(
+    r"^\s*[v=]*\s*(\d+)\.(\d+)\.(\d+)"
+    r"(?:-?([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?"
+    r"(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?\s*$"
+)
+_PARTIAL_RE = re.compile(
+    r"^[v=]*(\d+|[xX*])(?:\.(\d+|[xX*])(?:\.(\d+|[xX*])"
+    r"(?:-?([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?"
+    r"(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?)?)?$"
+)
+_COMPARATOR_RE = re.compile(r"^(~>?|\^|>=|<=|>|<|=)?\s*(.*)$")
+_HYPHEN_RE = re.compile(r"^\s*(\S+)\s+-\s+(\S+)\s*$")
+
+class InvalidRange(ValueError):
+    pass
+
+@total_ordering
+class SemVer:
+    __slots__ = ("major", "minor", "patch", "prerelease", "_key")
+
+    def __init__(self, major: int, minor: int, patch: int, prerelease: tuple[str, ...]=()):
+        self.major = major
+        self.minor = minor
+        self.patch = patch
+        self.prerelease = prerelease
+        # a release sorts after all of its prereleases, numeric identifiers sort before alphanumeric ones
+        prerelease_key = (1,) if not prerelease else (0, tuple(
+            (0, int(identifier), "") if identifier.isdigit() else (1, 0, identifier)
+            for identifier in prerelease
+        ))
+        self._key = (major, minor, patch, prerelease_key)
+
+    @classmethod
+    def parse(cls, version: str) -> "SemVer | None":
+        match = _VERSION_RE.match(version)
+        if match is None:
+            return None
+        major, minor, patch, prerelease, _ = match.groups()
+        return cls(int(major), int(minor), int(patch), tuple(prerelease.split(".")) if prerelease else ())
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SemVer) and self._key == other._key
+
+    def __lt__(self, other: "SemVer") -> bool:
+        return self._key < other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __str__(self) -> str:
+        version = f"{self.major}.{self.minor}.{self.patch}"
+        if self.prerelease:
+            version += "-" + ".".join(self.prerelease)
+        return version
+
+_ANY = SemVer(0, 0, 0)
+
+Comparator = tuple[str, SemVer]  # operator is one of <, <=, >, >=, =
+
+def _is_wildcard(part: str | None) -> bool:
+    return part is None or part in ("x", "X", "*")
+
+def _parse_partial(version: str) -> tuple[int | None, int | None, int | None, tuple[str, ...]]:
+    match = _PARTIAL_RE.match(version)
+    if match is None:
+        raise InvalidRange(f"Invalid version: {version}")
+    major, minor, patch, prerelease = match.groups()
+    parts: list[int | None] = []
+    for part in (major, minor, patch):
+        # once a part is a wildcard, all following parts are as well
+        if _is_wildcard(part) or (parts and parts[-1] is None):
+            parts.append(None)
+        else:
+            parts.append(int(part))
+    return parts[0], parts[1], parts[2], tuple(prerelease.split(".")) if prerelease and parts[2] is not None else ()
+
+def _upper(major: int, minor: int=0, patch: int=0) -> SemVer:
+    # exclusive upper bound that also excludes prereleases of the bound itself, like "<2.0.0-0"
+    return SemVer(major, minor, patch, ("0",))
+
+def _desugar(operator: str, version: str) -> list[Comparator]:
+    major, minor, patch, prerelease = _parse_partial(version) if version else (None, None, None, ())
+    if major is None:
+        # "", "*", "x.x.x" and the like match any version
+        if operator in ("<", ">"):
+            return [("<", _ANY)]  # matches nothing
+        return []
+
+    if operator in ("~", "~>"):
+        if minor is None:
+            return [(">=", SemVer(major, 0, 0)), ("<", _upper(major + 1))]
+        return [(">=", SemVer(major, minor, patch or 0, prerelease)), ("<", _upper(major, minor + 1))]
+
+    if operator == "^":
+        low = SemVer(major, minor or 0, patch or 0, prerelease)
+        if major != 0 or minor is None:
+            high = _upper(major + 1)
+        elif minor != 0 or patch is None:
+            high = _upper(0, minor + 1)
+        else:
+            high = _upper(0, 0, patch + 1)
+        return [(">=", low), ("<", high)]
+
+    if minor is None or patch is None:
+        # x-range like "1.2" or ">1.x"
+        if operator in ("", "="):
+            low = SemVer(major, minor or 0, 0)
+            high = _upper(major + 1) if minor is None else _upper(major, minor + 1)
+            return [(">=", low), ("<", high)]
+        if operator == ">":
+            return [(">=", SemVer(major + 1, 0, 0) if minor is None else SemVer(major, minor + 1, 0))]
+        if operator == ">=":
+            return [(">=", SemVer(major, minor or 0, 0))]
+        if operator == "<":
+            return [("<", _upper(major, minor or 0))]
+        if operator == "<=":
+            return [("<", _upper(major + 1) if minor is None else _upper(major, minor + 1))]
+
+    return [(operator or "=", SemVer(major, minor, patch, prerelease))]
+
+def _parse_comparator_set(comparator_set: str) -> list[Comparator]:
+    hyphen = _HYPHEN_RE.match(comparator_set)
+    if hyphen is not None:
+        low, high = hyphen.groups()
+        comparators = [c for c in _desugar(">=", low) if c[0] == ">="]
+        high_major, high_minor, high_patch, high_prerelease = _parse_partial(high)
+        if high_major is None:
+            return comparators
+        if high_minor is None:
+            comparators.append(("<", _upper(high_major + 1)))
+        elif high_patch is None:
+            comparators.append(("<", _upper(high_major, high_minor + 1)))
+        else:
+            comparators.append(("<=", SemVer(high_major, high_minor, high_patch, high_prerelease)))
+        return comparators
+
+    # allow a space between operator and version, e.g. ">= 1.2.3"
+    tokens = re.sub(r"(~>?|\^|>=|<=|>|<|=)\s+", r"\1", comparator_set.strip()).split()
+    comparators: list[Comparator] = []
+    for token in tokens:
+        match = _COMPARATOR_RE.match(token)
+        assert match is not None
+        operator, version = match.groups()
+        comparators.extend(_desugar(operator or "", version))
+    return comparators
+
+@lru_cache(maxsize=4096)
+def parse_range(range_str: str) -> tuple[tuple[Comparator, ...], ...]:
+    """Parse an npm version range into alternative sets of comparators."""
+    return tuple(
+        tuple(_parse_comparator_set(comparator_set))
+        for comparator_set in range_str.split("||")
+    )
+
+def _test(operator: str, version: SemVer, bound: SemVer) -> bool:
+    match operator:
+        case "<":
+            return version < bound
+        case "<=":
+            return version <= bound
+        case ">":
+            return version > bound
+        case ">=":
+            return version >= bound
+        case _:
+            return version == bound
+
+def _satisfies_set(version: SemVer, comparators: tuple[Comparator, ...]) -> bool:
+    if not all(_test(operator, version, bound) for operator, bound in comparators):
+        return False
+    if not version.prerelease:
+        return True
+    # prereleases only match if a comparator of the same set opts into prereleases of that exact version
+    return any(
+        bound.prerelease and (bound.major, bound.minor, bound.patch) == (version.major, version.minor, version.patch)
+        for _, bound in comparators
+    )
+
+def satisfies(version: SemVer, range_str: str) -> bool:
+    return any(_satisfies_set(version, comparators) for comparators in parse_range(range_str))
+
+def is_valid_range(range_str: str) -> bool:
+    try:
+        parse_range(range_str)
+    except InvalidRange:
+        return False
+    return True
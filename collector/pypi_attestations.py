@@ -1,5 +1,5 @@
 from tempfile import TemporaryDirectory
-from functools import lru_cache
+from functools import partial
 from pathlib import Path
 from rfc3986 import exceptions, uri_reference, validators
 from packaging.utils import (
@@ -8,14 +8,25 @@ from packaging.utils import (
 )
 
 from pydantic import ValidationError
-import requests
-from pypi_attestations import Distribution, GooglePublisher, VerificationError, Provenance, GitHubPublisher, GitLabPublisher
+import sigstore.errors
+from sigstore.dsse import _Statement
+from sigstore.verify.policy import VerificationPolicy
+from pypi_attestations import Distribution, GooglePublisher, VerificationError, Provenance, GitHubPublisher, GitLabPublisher, AttestationType
+from pypi_attestations import Attestation as PyPIAttestation
 from pypi_attestations._cli import _download_file
+from pypi_attestations._impl import _check_dist_filename
+
+import requests
 
 from .models import Attestation
+from .attestation_cache import attestation_cache
+from .http_client import DEFAULT_HOST_CONCURRENCY, http_client, run_concurrently
+from .sigstore_verification import verify_dsse
+
+class TransientError(RuntimeError):
+    """Provenance could not be fetched right now, e.g. because PyPI is overloaded."""
 
 # Copied from pypi_attestations package.
-@lru_cache(maxsize=None)
 def _get_provenance_from_pypi(filename: str) -> Provenance:
     """Use PyPI's integrity API to get a distribution's provenance."""
     # Filename is already validated when creating the Distribution object
@@ -25,13 +36,13 @@ def _get_provenance_from_pypi(filename: str) -> Provenance:
         name, version, _, _ = parse_wheel_filename(filename)
 
     provenance_url = f"https://pypi.org/integrity/{name}/{version}/{filename}/provenance"
-    response = requests.get(provenance_url)
+    response = http_client.get(provenance_url)
     if response.status_code == 403:
-        raise RuntimeError("Access to provenance is temporarily disabled by PyPI administrators")
+        raise TransientError("Access to provenance is temporarily disabled by PyPI administrators")
     elif response.status_code == 404:
         raise FileNotFoundError(f'Provenance for file "{filename}" was not found')
     elif response.status_code != 200:
-        raise RuntimeError(
+        raise TransientError(
             f"Unexpected error while downloading provenance file from PyPI, Integrity API "
             f"returned status code: {response.status_code}"
         )
@@ -75,35 +86,82 @@ def _check_repository_identity(
             f'expected "{expected_repository}"'
         )
 
-def verify_pypi_attestations_from_dist_filename_and_hash(dist_filename: str, dist_hash: str, expected_repository_url: str | None) -> list[Attestation]:
-    if dist_hash.startswith("sha256:"):
-        dist_hash_sha256 = dist_hash[7:]
-    else:
-        raise RuntimeError(f"Unsupported hash format: {dist_hash}")
+# Like Attestation.verify from pypi_attestations, but with the verifier shared by the process.
+def _verify_attestation(attestation: PyPIAttestation, policy: VerificationPolicy, dist: Distribution):
+    try:
+        payload = verify_dsse(attestation.to_bundle(), policy)
+    except sigstore.errors.VerificationError as err:
+        raise VerificationError(str(err)) from err
 
-    dist = Distribution(name=dist_filename, digest=dist_hash_sha256)
-    
-    out: list[Attestation] = []
+    try:
+        statement = _Statement.model_validate_json(payload)
+    except ValidationError as e:
+        raise VerificationError(f"invalid statement: {str(e)}")
+
+    if len(statement.subjects) != 1:
+        raise VerificationError("too many subjects in statement (must be exactly one)")
+    subject = statement.subjects[0]
+
+    if not subject.name:
+        raise VerificationError("invalid subject: missing name")
 
     try:
-        provenance = _get_provenance_from_pypi(dist.name)
-    except FileNotFoundError:
-        return [Attestation(
-            error_code="missing",
-        )]
+        parsed_subject_name = _check_dist_filename(subject.name)
+    except ValueError as e:
+        raise VerificationError(f"invalid subject: {str(e)}")
+
+    if parsed_subject_name != _check_dist_filename(dist.name):
+        raise VerificationError(
+            f"subject does not match distribution name: {subject.name} != {dist.name}"
+        )
+
+    digest = subject.digest.root.get("sha256")
+    if digest is None or digest != dist.digest:
+        raise VerificationError("subject does not match distribution digest")
+
+    try:
+        AttestationType(statement.predicate_type)
+    except ValueError:
+        raise VerificationError(f"unknown attestation type: {statement.predicate_type}")
+
+class _VerificationContext:
+    """State shared by the verification of several distributions, which are often signed in the same workflow run."""
+
+    def __init__(self, expected_repository_url: str | None):
+        self.expected_repository_url = expected_repository_url
+        self._policies: dict[str, VerificationPolicy] = {}
+        self._cert_claims: dict[bytes, dict[str, str]] = {}
+
+    def policy(self, publisher: GitHubPublisher | GitLabPublisher) -> VerificationPolicy:
+        key = publisher.model_dump_json()
+        policy = self._policies.get(key)
+        if policy is None:
+            if self.expected_repository_url is not None:
+                _check_repository_identity(expected_repository_url=self.expected_repository_url, publisher=publisher)
+            policy = publisher._as_policy()  # noqa: SLF001
+            self._policies[key] = policy
+        return policy
+
+    def certificate_claims(self, attestation: PyPIAttestation) -> dict[str, str]:
+        certificate = attestation.verification_material.certificate
+        cert_claims = self._cert_claims.get(certificate)
+        if cert_claims is None:
+            cert_claims = attestation.certificate_claims
+            self._cert_claims[certificate] = cert_claims
+        return cert_claims
+
+def _verify_provenance(provenance: Provenance, dist: Distribution, context: _VerificationContext) -> list[Attestation]:
+    out: list[Attestation] = []
 
     try:
         for attestation_bundle in provenance.attestation_bundles:
             publisher = attestation_bundle.publisher
             if isinstance(publisher, GooglePublisher):  # pragma: no cover
                 raise RuntimeError("This CLI doesn't support Google Cloud-based publisher verification")
-            if expected_repository_url is not None:
-                _check_repository_identity(expected_repository_url=expected_repository_url, publisher=publisher)
-            policy = publisher._as_policy()  # noqa: SLF001
-            # print(publisher.model_dump_json(indent=2))
+            policy = context.policy(publisher)
             for attestation in attestation_bundle.attestations:
-                attestation.verify(policy, dist)
-                cert_claims = attestation.certificate_claims
+                _verify_attestation(attestation, policy, dist)
+                cert_claims = context.certificate_claims(attestation)
                 issuer = cert_claims["1.3.6.1.4.1.57264.1.8"]
                 runner_env = cert_claims["1.3.6.1.4.1.57264.1.11"]
                 repo_url = cert_claims["1.3.6.1.4.1.57264.1.12"]
@@ -134,10 +192,64 @@ def verify_pypi_attestations_from_dist_filename_and_hash(dist_filename: str, dis
         ))
     return out
 
+def _get_provenance_if_exists(filename: str) -> Provenance | TransientError | None:
+    try:
+        return _get_provenance_from_pypi(filename)
+    except FileNotFoundError:
+        return None
+    except requests.RequestException as e:
+        return TransientError(str(e))
+    except TransientError as e:
+        return e
+
+def verify_pypi_attestations_batch(dists: list[tuple[str, str]], expected_repository_url: str | None) -> list[list[Attestation]]:
+    """Verify the attestations of several distributions given as (filename, hash), e.g. all files of a release.
+
+    Provenance is fetched concurrently, and publisher policies, repository checks and
+    certificate claims are shared between the distributions.
+    """
+    distributions: list[Distribution] = []
+    cache_keys: list[str] = []
+    results: list[list[Attestation] | None] = []
+    for dist_filename, dist_hash in dists:
+        if dist_hash.startswith("sha256:"):
+            dist_hash_sha256 = dist_hash[7:]
+        else:
+            raise RuntimeError(f"Unsupported hash format: {dist_hash}")
+        distributions.append(Distribution(name=dist_filename, digest=dist_hash_sha256))
+        cache_keys.append(attestation_cache.key("pypi", dist_hash, expected_repository_url))
+        results.append(attestation_cache.get(cache_keys[-1]))
+
+    uncached = [i for i, result in enumerate(results) if result is None]
+    if len(uncached) == 1:
+        provenances = [_get_provenance_if_exists(distributions[uncached[0]].name)]
+    else:
+        provenances = run_concurrently([partial(_get_provenance_if_exists, distributions[i].name) for i in uncached],
+                                       max_workers=DEFAULT_HOST_CONCURRENCY)
+
+    context = _VerificationContext(expected_repository_url)
+    for i, provenance in zip(uncached, provenances):
+        if isinstance(provenance, TransientError):
+            # not cached, the next run checks again
+            results[i] = [Attestation(error_code="transient", error_msg=str(provenance))]
+            continue
+        elif provenance is None:
+            out = [Attestation(
+                error_code="missing",
+            )]
+        else:
+            out = _verify_provenance(provenance, distributions[i], context)
+        attestation_cache.put(cache_keys[i], out)
+        results[i] = out
+    return results
+
+def verify_pypi_attestations_from_dist_filename_and_hash(dist_filename: str, dist_hash: str, expected_repository_url: str | None) -> list[Attestation]:
+    return verify_pypi_attestations_batch([(dist_filename, dist_hash)], expected_repository_url)[0]
+
 
 def get_latest_whl_urls(package_name: str) -> tuple[str, list[str]]:
     url = f"https://pypi.org/pypi/{package_name}/json"
-    response = requests.get(url)
+    response = http_client.get(url)
     if response.status_code != 200:
         raise ValueError(f"Package '{package_name}' not found on PyPI.")
     
@@ -1,9 +1,14 @@
 from tempfile import TemporaryDirectory
-import subprocess
 from pathlib import Path
-import tomlkit
+import sys
+import tomllib
+from packaging.utils import canonicalize_name
 
-from .models import Package, Artifact, DependencyTreeNode, Packages, PackageInfo
+from .models import PACKAGE_INFO_FORMAT_VERSION, Package, Artifact, Packages, PackageInfo
+from .instrumentation import instrumentation
+from .dependency_graph import build_dependency_graph, print_dependency_graph
+from .pypi_resolver import ResolutionError, resolve_pypi_dependencies
+from .resolvers import diff_packages
 
 
 def create_poetry_lock(tmp_dir: Path, pkg_name: str, pkg_version: str) -> Path:
@@ -25,20 +30,23 @@ def create_poetry_lock(tmp_dir: Path, pkg_name: str, pkg_version: str) -> Path:
     """
     pyproject_path = tmp_dir  / "pyproject.toml"
     pyproject_path.write_text(pyproject_content)
-    subprocess.run(["poetry", "lock"], cwd=tmp_dir, check=True)
+    instrumentation.run_subprocess(["poetry", "lock"], cwd=tmp_dir, check=True)
 
     return tmp_dir / "poetry.lock"
 
 def parse_poetry_lock(file_path: Path) -> Packages:
-    lock_data = tomlkit.parse(file_path.read_text())
+    """Get the packages of a poetry.lock, with the read-only TOML parser of the standard library."""
+    with file_path.open("rb") as f:
+        lock_data = tomllib.load(f)
 
     packages: Packages = {}
     for pkg in lock_data.get("package", []):
-        name = pkg["name"].replace("_", "-")
+        # interned, so the packages depending on it share one string with it
+        name = sys.intern(pkg["name"].replace("_", "-"))
         packages[name] = Package(
             type="pypi",
             version=pkg["version"],
-            dependencies=list(pkg.get("dependencies", {}).keys()),
+            dependencies=[sys.intern(dependency) for dependency in pkg.get("dependencies", ())],
             artifacts=[
                 Artifact(name=entry["file"], hash=entry["hash"])
                 for entry in pkg.get("files", [])
@@ -47,61 +55,45 @@ def parse_poetry_lock(file_path: Path) -> Packages:
 
     return packages
 
-def build_dependency_tree(dependency_map: Packages, package_name: str, visited: set[str] | None=None) -> DependencyTreeNode | None:
-    package_name = package_name.replace("_", "-")
-
-    if visited is None:
-        visited = set()
-
-    if package_name not in dependency_map:
-        # not found, edge case
-        return None
-
-    if package_name in visited:
-        raise RuntimeError(f"Circular dependency detected for package {package_name}")
-
-    visited.add(package_name)
-
-    pkg = dependency_map[package_name]
-    dependencies: list[DependencyTreeNode] = []
-
-    for dep_name in pkg.dependencies:
-        subtree = build_dependency_tree(dependency_map, dep_name, visited.copy())
-        if subtree is not None:
-            dependencies.append(subtree)
-
-    node = DependencyTreeNode(
-        name=package_name,
-        dependencies=dependencies
-    )
-
-    return node
-
-def get_pypi_package_info(pkg_name: str, pkg_version: str, tmp_dir: Path) -> PackageInfo:
+def lock_with_poetry(pkg_name: str, pkg_version: str, tmp_dir: Path) -> Packages:
     tmp_dir.mkdir(parents=True, exist_ok=True)
     lock_file_path = create_poetry_lock(tmp_dir, pkg_name, pkg_version)
-    dependencies = parse_poetry_lock(lock_file_path)
-    tree = build_dependency_tree(dependencies, pkg_name)
-    assert tree is not None
+    return parse_poetry_lock(lock_file_path)
+
+def get_pypi_package_info(pkg_name: str, pkg_version: str, tmp_dir: Path, resolver: str="builtin") -> PackageInfo:
+    """Resolve and lock the dependencies of a package.
+
+    The builtin resolver falls back to Poetry if it cannot resolve a package. The
+    "external" resolver always uses Poetry, and "validate" compares both and reports differences.
+    """
+    with instrumentation.stage("resolution"):
+        if resolver == "external":
+            dependencies = lock_with_poetry(pkg_name, pkg_version, tmp_dir)
+        else:
+            try:
+                dependencies = resolve_pypi_dependencies(pkg_name, pkg_version)
+            except ResolutionError as e:
+                print(f"Falling back to Poetry for {pkg_name}: {e}")
+                dependencies = lock_with_poetry(pkg_name, pkg_version, tmp_dir)
+            else:
+                if resolver == "validate":
+                    differences = diff_packages(lock_with_poetry(pkg_name, pkg_version, tmp_dir), dependencies, canonicalize_name)
+                    for difference in differences:
+                        print(f"Resolver difference for {pkg_name}: {difference}")
+    with instrumentation.stage("graph"):
+        root_name = next(name for name in dependencies if canonicalize_name(name) == canonicalize_name(pkg_name))
+        # Poetry keeps dependency names as written by the package authors
+        graph = build_dependency_graph(dependencies, root_name, lambda name: name.replace("_", "-"))
+    assert graph is not None
     return PackageInfo(
-        name=pkg_name.replace("_", "-"),
+        format_version=PACKAGE_INFO_FORMAT_VERSION,
+        name=root_name,
         packages=dependencies,
-        tree=tree,
+        graph=graph,
     )
 
 def print_dependency_tree(dependency_tree: PackageInfo, indent=0):
-    _print_dependency_tree(dependency_tree.tree, dependency_tree.packages, indent)
-
-def _print_dependency_tree(tree: DependencyTreeNode, packages: Packages, indent=0):
-    if tree is None:
-        return
-    prefix = " " * indent
-
-    pkg = packages[tree.name]
-    print(f"{prefix}{tree.name}=={pkg.version} ({len(pkg.artifacts)} artifacts)")
-
-    for dep in tree.dependencies:
-        _print_dependency_tree(dep, packages, indent + 2)
+    print_dependency_graph(dependency_tree, indent)
 
 if __name__ == "__main__":
     pkg_name = "oceanbase_mcp_server"
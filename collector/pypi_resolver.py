@@ -0,0 +1,245 @@
+from collections import deque
+from collections.abc import Iterable
+from email.parser import HeaderParser
+from functools import lru_cache
+import sys
+
+from packaging.markers import Marker
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.utils import (
+    InvalidSdistFilename,
+    InvalidWheelFilename,
+    canonicalize_name,
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+from packaging.version import InvalidVersion, Version
+
+from .http_client import http_client
+from .models import Artifact, Package, Packages
+
+PYPI_SIMPLE_URL = "https://pypi.org/simple"
+PYPI_JSON_URL = "https://pypi.org/pypi"
+
+# Same target as the pyproject.toml written by create_poetry_lock.
+PYTHON_VERSION = Version("3.13.0")
+
+_BASE_ENVIRONMENT = {
+    "implementation_name": "cpython",
+    "implementation_version": "3.13.0",
+    "platform_python_implementation": "CPython",
+    "python_version": "3.13",
+    "python_full_version": "3.13.0",
+    "platform_release": "",
+    "platform_version": "",
+}
+
+# Like Poetry, resolve for all platforms: a dependency applies if its marker holds on any of them.
+_ENVIRONMENTS = [
+    {**_BASE_ENVIRONMENT, "os_name": "posix", "sys_platform": "linux", "platform_system": "Linux", "platform_machine": "x86_64"},
+    {**_BASE_ENVIRONMENT, "os_name": "posix", "sys_platform": "linux", "platform_system": "Linux", "platform_machine": "aarch64"},
+    {**_BASE_ENVIRONMENT, "os_name": "nt", "sys_platform": "win32", "platform_system": "Windows", "platform_machine": "AMD64"},
+    {**_BASE_ENVIRONMENT, "os_name": "posix", "sys_platform": "darwin", "platform_system": "Darwin", "platform_machine": "arm64"},
+]
+
+MAX_RESOLUTION_ROUNDS = 50
+
+class ResolutionError(Exception):
+    pass
+
+class _Release:
+    def __init__(self, version: str):
+        self.version = version  # version as published, e.g. "2024.01.1"
+        self.files: list[dict] = []
+
+def _parse_file_version(filename: str) -> Version | None:
+    try:
+        if filename.endswith(".whl"):
+            return parse_wheel_filename(filename)[1]
+        if filename.endswith((".tar.gz", ".zip")):
+            return parse_sdist_filename(filename)[1]
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        pass
+    return None
+
+def _supports_python(requires_python: str | None) -> bool:
+    if not requires_python:
+        return True
+    try:
+        return SpecifierSet(requires_python).contains(PYTHON_VERSION, prereleases=True)
+    except InvalidSpecifier:
+        return True
+
+@lru_cache(maxsize=None)
+def get_releases(name: str) -> dict[Version, _Release]:
+    """Get the non-yanked releases of a project and their files from PyPI's simple API."""
+    response = http_client.get(f"{PYPI_SIMPLE_URL}/{name}/", headers={"Accept": "application/vnd.pypi.simple.v1+json"})
+    if response.status_code == 404:
+        raise ResolutionError(f"Package '{name}' not found on PyPI")
+    response.raise_for_status()
+    data = response.json()
+
+    published_versions: dict[Version, str] = {}
+    for version_str in data.get("versions", []):
+        try:
+            published_versions[Version(version_str)] = version_str
+        except InvalidVersion:
+            pass
+
+    releases: dict[Version, _Release] = {}
+    for file in data["files"]:
+        if file.get("yanked"):
+            continue
+        version = _parse_file_version(file["filename"])
+        if version is None:
+            continue
+        if version not in releases:
+            releases[version] = _Release(published_versions.get(version, str(version)))
+        releases[version].files.append(file)
+    return releases
+
+@lru_cache(maxsize=None)
+def get_requirements(name: str, version: Version) -> tuple[Requirement, ...]:
+    """Get the requirements of a release, preferring the wheel metadata served alongside the simple API (PEP 658)."""
+    release = get_releases(name)[version]
+    wheels_with_metadata = [
+        file for file in release.files
+        if file["filename"].endswith(".whl") and (file.get("core-metadata") or file.get("data-dist-info-metadata"))
+    ]
+    if wheels_with_metadata:
+        response = http_client.get(wheels_with_metadata[0]["url"] + ".metadata")
+        response.raise_for_status()
+        requires_dist = HeaderParser().parsestr(response.text).get_all("Requires-Dist") or []
+    else:
+        response = http_client.get(f"{PYPI_JSON_URL}/{name}/{release.version}/json")
+        response.raise_for_status()
+        requires_dist = response.json()["info"].get("requires_dist")
+        # without wheels, a missing value may also mean the metadata is only in the sdist
+        if requires_dist is None and not any(file["filename"].endswith(".whl") for file in release.files):
+            raise ResolutionError(f"Unknown requirements for sdist-only release {name}=={release.version}")
+        requires_dist = requires_dist or []
+
+    requirements: list[Requirement] = []
+    for requirement in requires_dist:
+        try:
+            requirements.append(Requirement(requirement))
+        except InvalidRequirement as e:
+            raise ResolutionError(f"Invalid requirement '{requirement}' of {name}=={release.version}: {e}")
+    return tuple(requirements)
+
+def _marker_applies(marker: Marker | None, extras: Iterable[str]) -> bool:
+    if marker is None:
+        return True
+    return any(
+        marker.evaluate({**environment, "extra": extra})
+        for environment in _ENVIRONMENTS
+        for extra in ("", *extras)
+    )
+
+# a requirement is either the root requirement or required by a selected release
+_Origin = tuple[str, Version] | None
+
+class _Resolver:
+    """Greedy resolver picking the highest allowed version of each package.
+
+    Whenever a requirement excludes an already selected version, it is kept along with the release
+    requiring it and resolution restarts. Later rounds apply it only while that release is still
+    selected, so the pins of a release that was replaced do not constrain the resolution.
+    """
+
+    def __init__(self):
+        self.exclusions: dict[str, dict[_Origin, SpecifierSet]] = {}
+
+    def resolve(self, root: Requirement) -> Packages:
+        for _ in range(MAX_RESOLUTION_ROUNDS):
+            packages = self._resolve_round(root)
+            if packages is not None:
+                return packages
+        raise ResolutionError(f"Resolution of {root} did not converge")
+
+    def _select(self, name: str, specifier: SpecifierSet) -> Version:
+        for exclusion in self.exclusions.get(name, {}).values():
+            specifier &= exclusion
+        releases = get_releases(name)
+        candidates = [
+            version for version, release in releases.items()
+            if any(_supports_python(file.get("requires-python")) for file in release.files)
+        ]
+        allowed = list(specifier.filter(candidates))
+        if not allowed:
+            raise ResolutionError(f"No release of {name} matches '{specifier}'")
+        return max(allowed)
+
+    def _exclude(self, name: str, origin: _Origin, specifier: SpecifierSet):
+        exclusions = self.exclusions.setdefault(name, {})
+        exclusions[origin] = exclusions.get(origin, SpecifierSet()) & specifier
+
+    def _resolve_round(self, root: Requirement) -> Packages | None:
+        selected: dict[str, Version] = {}
+        extras: dict[str, set[str]] = {}
+        dependencies: dict[str, list[str]] = {}
+        conflicts = False
+
+        queue: deque[tuple[Requirement, _Origin]] = deque([(root, None)])
+        while queue:
+            requirement, origin = queue.popleft()
+            name = canonicalize_name(requirement.name)
+
+            if name in selected:
+                if not requirement.specifier.contains(selected[name], prereleases=True):
+                    # finish the round, so that it is known which releases are still selected
+                    self._exclude(name, origin, requirement.specifier)
+                    conflicts = True
+                    continue
+                if set(requirement.extras) <= extras[name]:
+                    continue
+                extras[name] |= set(requirement.extras)
+            else:
+                selected[name] = self._select(name, requirement.specifier)
+                extras[name] = set(requirement.extras)
+
+            dependencies[name] = []
+            for dependency in get_requirements(name, selected[name]):
+                if not _marker_applies(dependency.marker, extras[name]):
+                    continue
+                # interned, so the packages depending on it share one string
+                dependency_name = sys.intern(canonicalize_name(dependency.name))
+                if dependency_name not in dependencies[name]:
+                    dependencies[name].append(dependency_name)
+                queue.append((dependency, (name, selected[name])))
+
+        if conflicts:
+            for exclusions in self.exclusions.values():
+                for required_by in list(exclusions):
+                    if required_by is not None and selected.get(required_by[0]) != required_by[1]:
+                        del exclusions[required_by]
+            return None
+
+        packages: Packages = {}
+        for name, version in selected.items():
+            release = get_releases(name)[version]
+            packages[name] = Package(
+                type="pypi",
+                version=release.version,
+                dependencies=sorted(dependencies[name]),
+                artifacts=[
+                    Artifact(name=file["filename"], hash=f"sha256:{file['hashes']['sha256']}")
+                    for file in sorted(release.files, key=lambda file: file["filename"])
+                ],
+            )
+        return packages
+
+def resolve_pypi_dependencies(pkg_name: str, pkg_version: str) -> Packages:
+    """Resolve the dependencies of a package without Poetry, producing the same structure as parse_poetry_lock.
+
+    Package metadata is cached and shared by all resolutions within the process.
+    """
+    if pkg_version == "*":
+        specifier = ""
+    else:
+        try:
+            specifier = str(SpecifierSet(pkg_version))
+        except InvalidSpecifier:
+            specifier = f"=={pkg_version}"
+    return _Resolver().resolve(Requirement(f"{pkg_name}{specifier}"))
@@ -0,0 +1,33 @@
+from collections.abc import Callable
+
+from .models import Packages
+
+# builtin: in-process resolver, falling back to the package manager if it fails
+# external: always use the package manager (npm, poetry)
+# validate: use the builtin resolver and report differences to the package manager
+RESOLVERS = ("builtin", "external", "validate")
+
+def _normalize_packages(packages: Packages, normalize_name: Callable[[str], str]) -> dict[str, tuple[str, list[str], list[tuple[str, str]]]]:
+    # dependencies that were not resolved don't affect the dependency tree
+    normalized_names = {normalize_name(name) for name in packages}
+    return {
+        normalize_name(name): (
+            pkg.version,
+            sorted(normalize_name(dep) for dep in pkg.dependencies if normalize_name(dep) in normalized_names),
+            sorted((a.name, a.hash) for a in pkg.artifacts),
+        )
+        for name, pkg in packages.items()
+    }
+
+def diff_packages(expected: Packages, actual: Packages, normalize_name: Callable[[str], str]=str) -> list[str]:
+    expected_normalized = _normalize_packages(expected, normalize_name)
+    actual_normalized = _normalize_packages(actual, normalize_name)
+    differences: list[str] = []
+    for name in sorted(expected_normalized.keys() | actual_normalized.keys()):
+        if name not in actual_normalized:
+            differences.append(f"{name}: missing")
+        elif name not in expected_normalized:
+            differences.append(f"{name}: unexpected")
+        elif expected_normalized[name] != actual_normalized[name]:
+            differences.append(f"{name}: {expected_normalized[name]} != {actual_normalized[name]}")
+    return differences
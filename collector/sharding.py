@@ -0,0 +1,61 @@
+import heapq
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+from .dataset import RUN_REPORT_PATH, Dataset
+from .instrumentation import RunReport
+from .journal import server_key
+from .models import MCPServer
+
+class Shard(NamedTuple):
+    index: int  # 0-based
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index + 1}/{self.count}"
+
+def parse_shard(value: str) -> Shard:
+    """Parse a shard given as "i/N", with i from 1 to N."""
+    index, _, count = value.partition("/")
+    try:
+        shard = Shard(int(index) - 1, int(count))
+    except ValueError:
+        raise ValueError(f"Invalid shard: {value}, expected i/N")
+    if not 0 <= shard.index < shard.count:
+        raise ValueError(f"Invalid shard: {value}, i must be between 1 and N")
+    return shard
+
+def load_server_costs(dataset_dir: Path) -> dict[str, float]:
+    """Get the processing time of each server from the run report of a previous dataset."""
+    try:
+        report = RunReport.model_validate_json(Dataset.open(dataset_dir).read(RUN_REPORT_PATH))
+    except FileNotFoundError:
+        return {}
+    return {server: timings["server"].wall_s for server, timings in report.servers.items() if "server" in timings}
+
+def assign_shards(keys: Iterable[str], count: int, costs: dict[str, float]) -> dict[str, int]:
+    """Assign servers to shards, balancing their costs with the longest-processing-time-first heuristic.
+
+    The assignment only depends on the keys and costs, so all shards of a run compute the same one.
+    Servers without a cost are assumed to take the median time.
+    """
+    keys = sorted(set(keys))
+    known_costs = sorted(costs[key] for key in keys if key in costs)
+    default_cost = known_costs[len(known_costs) // 2] if known_costs else 1.0
+
+    loads = [(0.0, index) for index in range(count)]
+    assignment: dict[str, int] = {}
+    for key in sorted(keys, key=lambda key: (-costs.get(key, default_cost), key)):
+        load, index = heapq.heappop(loads)
+        assignment[key] = index
+        heapq.heappush(loads, (load + costs.get(key, default_cost), index))
+    return assignment
+
+def select_shard(servers: Iterable[MCPServer], shard: Shard, costs: dict[str, float]) -> list[MCPServer]:
+    """Select the servers of a shard. Registry entries of the same package always end up in the same shard."""
+    servers = list(servers)
+    assignment = assign_shards((server_key(mcp_server) for mcp_server in servers), shard.count, costs)
+    selected = [mcp_server for mcp_server in servers if assignment[server_key(mcp_server)] == shard.index]
+    print(f"Shard {shard}: {len(selected)} of {len(servers)} servers")
+    return selected
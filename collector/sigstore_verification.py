@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import threading
+from typing import cast
+
+import rekor_types
+from cryptography.hazmat.primitives.asymmetric import ec
+from packaging.specifiers import SpecifierSet
+from pydantic import ValidationError
+import sigstore
+from sigstore import dsse
+from sigstore._utils import base64_encode_pem_cert
+from sigstore.errors import VerificationError
+from sigstore.models import Bundle
+from sigstore.verify import Verifier
+from sigstore.verify.policy import VerificationPolicy
+
+from .http_client import http_client
+
+# The verification of intoto log entries uses internals of sigstore, which are only known to
+# match these versions. Keep in sync with requirements.txt.
+SUPPORTED_SIGSTORE_VERSIONS = SpecifierSet(">=4.5,<4.6")
+
+if sigstore.__version__ not in SUPPORTED_SIGSTORE_VERSIONS:
+    raise ImportError(
+        f"sigstore {sigstore.__version__} is not supported, the verification of npm provenance bundles "
+        f"(intoto log entries) requires sigstore{SUPPORTED_SIGSTORE_VERSIONS}"
+    )
+
+_verifier: Verifier | None = None
+_verifier_lock = threading.Lock()
+
+def production_verifier() -> Verifier:
+    """Get the Sigstore production verifier, whose trust root is only loaded once per process.
+
+    Verifiers do not keep state between verifications, so the instance is shared by all threads.
+    """
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = Verifier.production(offline=http_client.offline)
+        return _verifier
+
+def _validate_intoto_v002_entry_body(bundle: Bundle):
+    # Like sigstore's check of dsse entries, for the intoto entries of npm provenance bundles.
+    # https://github.com/sigstore/sigstore-python/issues/1384
+    envelope = bundle._dsse_envelope
+    assert envelope is not None
+    try:
+        entry_body = rekor_types.Intoto.model_validate_json(bundle.log_entry._inner.canonicalized_body)
+    except ValidationError as e:
+        raise VerificationError(f"invalid intoto log entry: {e}")
+    spec = entry_body.spec.root
+    if not isinstance(spec, rekor_types.intoto.IntotoV002Schema):
+        raise VerificationError("expected intoto v0.0.2 log entry")
+
+    payload_hash = spec.content.payload_hash
+    if payload_hash is None or payload_hash.algorithm != rekor_types.intoto.Algorithm.SHA256:
+        raise VerificationError("expected SHA256 payload hash in intoto log entry")
+    if payload_hash.value != hashlib.sha256(envelope._inner.payload).hexdigest():
+        raise VerificationError("log entry payload hash does not match bundle")
+
+    public_key = base64_encode_pem_cert(bundle.signing_certificate)
+    entry_signatures = spec.content.envelope.signatures
+    if len(entry_signatures) != len(envelope._inner.signatures):
+        raise VerificationError("log entry signatures do not match bundle")
+    for signature, entry_signature in zip(envelope._inner.signatures, entry_signatures):
+        # the log stores the base64 signature of the envelope base64-encoded once more, see
+        # "Signature is double-base64-encoded in the tlog entry" in sigstore-js
+        if (entry_signature.public_key != public_key
+                or entry_signature.sig.encode() != base64.b64encode(base64.b64encode(signature.sig))):
+            raise VerificationError("log entry signatures do not match bundle")
+
+def verify_dsse(bundle: Bundle, policy: VerificationPolicy) -> bytes:
+    """Verify a bundle with an in-toto statement in a DSSE envelope and return the statement.
+
+    Raises sigstore.errors.VerificationError on failure.
+    """
+    verifier = production_verifier()
+    kind_version = bundle.log_entry._inner.kind_version
+    if (kind_version.kind, kind_version.version) == ("intoto", "0.0.2"):
+        envelope = bundle._dsse_envelope
+        if envelope is None:
+            raise VerificationError("cannot perform DSSE verification on a bundle without a DSSE envelope")
+        # same steps as Verifier.verify_dsse, which does not support intoto log entries
+        verifier._verify_common_signing_cert(bundle, policy)
+        dsse._verify(cast(ec.EllipticCurvePublicKey, bundle.signing_certificate.public_key()), envelope)
+        _validate_intoto_v002_entry_body(bundle)
+        type_, payload = envelope._inner.payload_type, envelope._inner.payload
+    else:
+        type_, payload = verifier.verify_dsse(bundle, policy)
+
+    if type_ != dsse.Envelope._TYPE:
+        raise VerificationError(f"expected JSON envelope, got {type_}")
+    return payload
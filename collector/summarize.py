@@ -1,6 +1,20 @@
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import json
+import re
 
-from .models import PackageInfo, PackageSummary, PackageSummaries
+from .dataset import Dataset, package_info_filename
+from .models import PackageInfo, PackageSummary, PackageSummaries, SummaryManifest
+
+SUMMARY_PAGE_SIZE = 100
+
+def _search_tokens(summary: PackageSummary) -> set[str]:
+    # the full name keeps substring searches across separators working, e.g. "p-ser" in "mcp-server"
+    tokens = {summary.name.lower()}
+    for text in (summary.name, summary.description):
+        tokens.update(re.findall(r"[a-z0-9]+", text.lower()))
+    return tokens
 
 def summarize_package_info(package_info: PackageInfo) -> PackageSummary:
     dependency_count = len(package_info.packages) - 1
@@ -21,28 +35,123 @@ def summarize_package_info(package_info: PackageInfo) -> PackageSummary:
         name=package_info.name,
         version=package_info.packages[package_info.name].version,
         type=package_info.packages[package_info.name].type,
+        description=package_info.description,
         attestation_issuers=attestation_issuers,
         deps=dependency_count,
         has_error=has_error,
         deps_errors=len(deps_errors),
+        skipped_artifacts=sum(1 for pkg in package_info.packages.values() for f in pkg.artifacts if f.skipped),
     )
 
-def summarize_package_infos(input_folder: Path, output_path: Path):
-    json_files = sorted(Path(input_folder).glob("*.json"))
-    summaries: list[PackageSummary] = []
-    for json_file in json_files:
-        print(f"Processing {json_file.name}...")
-        package_info = PackageInfo.model_validate_json(json_file.read_text())
-        summarized_package = summarize_package_info(package_info)
-        summaries.append(summarized_package)
-    out = PackageSummaries(packages=summaries)
-    output_path.write_text(out.model_dump_json(indent=1))
+def summarize_package_file(json_file: Path) -> PackageSummary:
+    print(f"Processing {json_file.name}...")
+    return summarize_package_info(PackageInfo.model_validate_json(json_file.read_text()))
+
+def iter_package_summaries(json_files: Iterable[Path], jobs: int=1) -> Iterator[PackageSummary]:
+    """Summarize package info files one at a time, or in jobs worker processes, in the given order."""
+    if jobs <= 1:
+        yield from map(summarize_package_file, json_files)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(summarize_package_file, json_files, chunksize=16)
+
+class SummaryIndex:
+    """Summaries of the servers in a dataset, keyed by the name of their package info file.
+
+    Summaries can be added, replaced and removed one server at a time, without reading
+    the package info files of the other servers.
+    """
+
+    def __init__(self, summaries: Iterable[PackageSummary]=()):
+        self._summaries: dict[str, PackageSummary] = {}
+        for summary in summaries:
+            self.add(summary)
+
+    @staticmethod
+    def key(summary: PackageSummary) -> str:
+        return package_info_filename(summary.type, summary.name)
+
+    @classmethod
+    def load(cls, dataset: Dataset, path: str="summary.json") -> "SummaryIndex":
+        try:
+            return cls(PackageSummaries.model_validate_json(dataset.read(path)).packages)
+        except FileNotFoundError:
+            return cls()
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def add(self, summary: PackageSummary):
+        self._summaries[self.key(summary)] = summary
+
+    def remove(self, key: str):
+        self._summaries.pop(key, None)
+
+    def update(self, other: "SummaryIndex"):
+        """Add or replace the summaries of another index, e.g. of a shard."""
+        self._summaries.update(other._summaries)
+
+    def sync(self, json_files: dict[str, Path], jobs: int=1):
+        """Drop summaries of removed package info files and summarize files not in the index yet.
+
+        json_files maps the file names of the package info files to their paths.
+        """
+        for key in self._summaries.keys() - json_files.keys():
+            self.remove(key)
+        new_files = [json_files[key] for key in sorted(json_files.keys() - self._summaries.keys())]
+        for summary in iter_package_summaries(new_files, jobs):
+            self.add(summary)
+
+    def write(self, dataset: Dataset, path: str="summary.json"):
+        # same order as the package info files
+        out = PackageSummaries(packages=[self._summaries[key] for key in sorted(self._summaries)])
+        dataset.write(path, out.model_dump_json(indent=dataset.indent))
+
+    def write_shards(self, dataset: Dataset, shard_dir: str="summary", page_size: int=SUMMARY_PAGE_SIZE):
+        """Write the summaries as pages in the order of the dashboard, with a manifest and a search index.
+
+        The search index maps the tokens of package names and descriptions to the pages containing them.
+        """
+        summaries = sorted(self._summaries.values(), key=lambda summary: (summary.name.casefold(), summary.name, summary.type))
+        pages = [summaries[start:start + page_size] for start in range(0, len(summaries), page_size)]
+
+        search_index: dict[str, list[int]] = {}
+        page_paths: list[str] = []
+        for page_id, page in enumerate(pages):
+            page_path = f"page-{page_id:04d}.json"
+            dataset.write(f"{shard_dir}/{page_path}", PackageSummaries(packages=page).model_dump_json())
+            page_paths.append(page_path)
+            for token in set().union(*map(_search_tokens, page)):
+                search_index.setdefault(token, []).append(page_id)
+
+        dataset.write(f"{shard_dir}/search.json", json.dumps(dict(sorted(search_index.items())), separators=(",", ":")))
+        manifest = SummaryManifest(total=len(summaries), page_size=page_size, pages=page_paths, search_index="search.json")
+        dataset.write(f"{shard_dir}/manifest.json", manifest.model_dump_json(indent=dataset.indent))
+        # pages beyond the current number of pages
+        dataset.delete_unwritten(shard_dir)
+
+def _package_files(input_folder: Path) -> dict[str, Path]:
+    return {json_file.name: json_file for json_file in Path(input_folder).glob("*.json")}
+
+def summarize_package_infos(input_folder: Path, output_path: Path, jobs: int=1):
+    index = SummaryIndex()
+    index.sync(_package_files(input_folder), jobs)
+    index.write(Dataset(output_path.parent), output_path.name)
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Aggregate package info from multiple JSON files.")
     parser.add_argument("input_folder", type=Path, help="Path to the folder containing package info JSON files.")
     parser.add_argument("output_path", type=Path, help="Path to the output JSON file.")
+    parser.add_argument("--jobs", default=1, type=int, help="Number of files to summarize in parallel")
+    parser.add_argument("--shards", type=Path, help="Also write the paginated summary with a search index to this folder")
+    parser.add_argument("--update", action="store_true",
+                        help="Only summarize files missing from an existing output file, and drop removed ones")
     args = parser.parse_args()
 
-    summarize_package_infos(args.input_folder, args.output_path)
+    output_dataset = Dataset(args.output_path.parent)
+    index = SummaryIndex.load(output_dataset, args.output_path.name) if args.update else SummaryIndex()
+    index.sync(_package_files(args.input_folder), args.jobs)
+    index.write(output_dataset, args.output_path.name)
+    if args.shards is not None:
+        index.write_shards(Dataset(args.shards.parent), args.shards.name)
@@ -0,0 +1,93 @@
+import gzip
+import json
+
+import pytest
+
+from collector.dataset import MANIFEST_PATH, Dataset, load_package_info, write_package_info
+from collector.models import PACKAGE_INFO_FORMAT_VERSION, Artifact, Attestation, DependencyGraph, Package, PackageInfo
+
+def make_package_info() -> PackageInfo:
+    attestation = Attestation(
+        issuer="https://token.actions.githubusercontent.com",
+        repo_url="https://github.com/example/server",
+        run_url="https://github.com/example/server/actions/runs/1",
+        statement={"_type": "https://in-toto.io/Statement/v1", "subject": [{"name": "pkg:npm/server@1.0.0"}]},
+    )
+    return PackageInfo(
+        format_version=PACKAGE_INFO_FORMAT_VERSION,
+        name="server",
+        description="An example server",
+        packages={
+            "server": Package(type="npm", version="1.0.0", dependencies=["lib", "lib@2.0.0"],
+                              artifacts=[Artifact(name="pkg:npm/server@1.0.0", hash="sha512:01", attestations=[attestation])]),
+            "lib": Package(type="npm", version="1.0.0", dependencies=[],
+                           artifacts=[Artifact(name="pkg:npm/lib@1.0.0", hash="sha512:02", attestations=[Attestation(error_code="missing")])]),
+            "lib@2.0.0": Package(type="npm", name="lib", version="2.0.0", dependencies=[],
+                                 artifacts=[Artifact(name="pkg:npm/lib@2.0.0", hash="sha512:03", skipped=True)]),
+        },
+        graph=DependencyGraph(nodes=["server", "lib", "lib@2.0.0"], edges=[[1, 2], [], []]),
+    )
+
+@pytest.mark.parametrize("hashed", [False, True])
+def test_package_info_round_trip(tmp_path, hashed):
+    package_info = make_package_info()
+    dataset = Dataset(tmp_path, hashed=hashed)
+    write_package_info(dataset, "npm_server.json", package_info)
+    dataset.finish()
+
+    reopened = Dataset.open(tmp_path)
+    assert reopened.hashed == hashed
+    assert list(reopened.package_files()) == ["npm_server.json"]
+    assert load_package_info(reopened, "npm_server.json") == package_info
+
+    # only the issuer and error code are inline, the rest is in the store
+    inline = json.loads(reopened.read("packages/npm_server.json"))
+    server_artifact = inline["packages"]["server"]["artifacts"][0]
+    assert server_artifact["attestations"] == [{"issuer": "https://token.actions.githubusercontent.com"}]
+    assert "attestations_ref" in server_artifact
+    assert inline["packages"]["lib@2.0.0"]["name"] == "lib"
+    assert "name" not in inline["packages"]["lib"]
+
+def test_plain_and_hashed_have_same_content(tmp_path):
+    package_info = make_package_info()
+    plain, hashed = Dataset(tmp_path / "plain"), Dataset(tmp_path / "hashed", hashed=True)
+    for dataset in (plain, hashed):
+        write_package_info(dataset, "npm_server.json", package_info)
+        dataset.finish()
+    assert json.loads(plain.read("packages/npm_server.json")) == json.loads(hashed.read("packages/npm_server.json"))
+    # store entries are content-addressed in both formats
+    assert sorted(p.name for p in (tmp_path / "plain" / "store").rglob("*.json")) == \
+        sorted(p.name for p in (tmp_path / "hashed" / "store").rglob("*.json"))
+
+def test_hashed_files(tmp_path):
+    dataset = Dataset(tmp_path, hashed=True)
+    dataset.write("summary.json", '{"a":1}')
+    dataset.finish()
+    first = dataset.resolve("summary.json")
+    assert first != tmp_path / "summary.json"
+    assert gzip.decompress(first.with_name(first.name + ".gz").read_bytes()) == b'{"a":1}'
+
+    # unchanged content keeps its name, changed content replaces the previous file
+    dataset = Dataset.open(tmp_path)
+    dataset.write("summary.json", '{"a":1}')
+    assert dataset.resolve("summary.json") == first
+    dataset.write("summary.json", '{"a":2}')
+    dataset.finish()
+    assert not first.exists()
+    assert Dataset.open(tmp_path).read("summary.json") == b'{"a":2}'
+    assert json.loads((tmp_path / MANIFEST_PATH).read_bytes())["files"]["summary.json"] == dataset.resolve("summary.json").name
+
+@pytest.mark.parametrize("hashed", [False, True])
+def test_delete_unwritten(tmp_path, hashed):
+    dataset = Dataset(tmp_path, hashed=hashed)
+    dataset.write("summary/1.json", "1")
+    dataset.write("summary/2.json", "2")
+    dataset.finish()
+    dataset = Dataset.open(tmp_path)
+    dataset.write("summary/1.json", "1")
+    dataset.delete_unwritten("summary")
+    dataset.finish()
+    reopened = Dataset.open(tmp_path)
+    assert reopened.read("summary/1.json") == b"1"
+    with pytest.raises(FileNotFoundError):
+        reopened.read("summary/2.json")
@@ -0,0 +1,68 @@
+from collector.dataset import Dataset
+from collector.dependents import DependentsIndex
+from collector.models import PACKAGE_INFO_FORMAT_VERSION, Artifact, Attestation, Package, PackageInfo
+
+def make_package_info(name: str, dependencies: dict[str, str | None]) -> PackageInfo:
+    """A server with dependencies given as name -> attestation error code, all at version 1.0.0."""
+    def package(error: str | None, deps: list[str]) -> Package:
+        attestation = Attestation(error_code=error) if error is not None else Attestation(issuer="GitHub")
+        return Package(type="npm", version="1.0.0", artifacts=[Artifact(name="a", hash="sha512:00", attestations=[attestation])],
+                       dependencies=deps)
+
+    return PackageInfo(
+        format_version=PACKAGE_INFO_FORMAT_VERSION,
+        name=name,
+        packages={name: package(None, list(dependencies)), **{dep: package(error, []) for dep, error in dependencies.items()}},
+    )
+
+def test_dependents():
+    index = DependentsIndex()
+    index.add(make_package_info("server-a", {"shared": None}))
+    index.add(make_package_info("server-b", {"shared": None, "other": None}))
+    assert index.dependents("npm", "shared") == {"npm:shared@1.0.0": ["npm:server-a", "npm:server-b"]}
+    index.remove("npm:server-a")
+    assert index.dependents("npm", "shared", "1.0.0") == {"npm:shared@1.0.0": ["npm:server-b"]}
+    assert index.dependents("npm", "server-a") == {}
+
+def test_errors_of_several_servers():
+    index = DependentsIndex()
+    index.add(make_package_info("server-a", {"shared": "transient"}))
+    index.add(make_package_info("server-b", {"shared": None}))
+    # the last server added does not overwrite the error of the first
+    assert index.error("npm:shared@1.0.0") == "transient"
+    index.add(make_package_info("server-c", {"shared": "verification"}))
+    assert index.error("npm:shared@1.0.0") == "verification"
+    # removing a server keeps the errors of the others
+    index.remove("npm:server-c")
+    assert index.error("npm:shared@1.0.0") == "transient"
+    index.add(make_package_info("server-a", {"shared": None}))
+    assert index.error("npm:shared@1.0.0") is None
+
+def test_write_and_load(tmp_path):
+    index = DependentsIndex()
+    index.add(make_package_info("server-a", {"shared": "missing", "other": None}))
+    index.add(make_package_info("server-b", {"shared": "transient"}))
+    dataset = Dataset(tmp_path)
+    index.write(dataset)
+    loaded = DependentsIndex.load(dataset)
+    assert loaded.dependents("npm", "shared") == index.dependents("npm", "shared")
+    assert loaded.error("npm:shared@1.0.0") == "missing"
+    loaded.remove("npm:server-a")
+    assert loaded.error("npm:shared@1.0.0") == "transient"
+    assert loaded.error("npm:other@1.0.0") is None
+
+def test_update_with_shard():
+    index = DependentsIndex()
+    index.add(make_package_info("server-a", {"shared": "missing"}))
+    index.add(make_package_info("server-b", {"shared": "missing"}))
+    shard = DependentsIndex()
+    shard.add(make_package_info("server-b", {"shared": None}))
+    index.update(shard)
+    assert index.error("npm:shared@1.0.0") == "missing"
+    shard.add(make_package_info("server-a", {"shared": None}))
+    index.update(shard)
+    assert index.error("npm:shared@1.0.0") is None
+
+def test_load_invalid(tmp_path):
+    (tmp_path / "dependents.json").write_text('{"servers": ["npm:a"], "packages": {"npm:a@1.0.0": [0]}, "errors": {"npm:a@1.0.0": "missing"}}')
+    assert len(DependentsIndex.load(Dataset(tmp_path))) == 0
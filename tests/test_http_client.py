@@ -0,0 +1,42 @@
+import threading
+
+import requests
+
+from collector.http_client import DEFAULT_MAX_WORKERS, HttpClient, run_concurrently
+
+def test_run_concurrently_nested():
+    # more outer calls than threads, each waiting for nested calls
+    def outer(i: int) -> list[int]:
+        return run_concurrently([lambda j=j: i * 10 + j for j in range(3)], max_workers=2)
+
+    results = run_concurrently([lambda i=i: outer(i) for i in range(2 * DEFAULT_MAX_WORKERS)])
+    assert results == [[i * 10, i * 10 + 1, i * 10 + 2] for i in range(2 * DEFAULT_MAX_WORKERS)]
+
+def test_run_concurrently_shares_threads():
+    def thread_names() -> list[str]:
+        return [threading.current_thread().name, *run_concurrently([lambda: threading.current_thread().name])]
+
+    first, second = run_concurrently([thread_names, thread_names])
+    # one pool per nesting level, the same for all calls
+    assert all(name.startswith("run_concurrently-0_") for name in (first[0], second[0]))
+    assert all(name.startswith("run_concurrently-1_") for name in (first[1], second[1]))
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    def get(url: str, **kwargs) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response.headers["ETag"] = '"1"'
+        response._content = b'{"a":\n 1}\n'
+        return response
+
+    client = HttpClient()
+    client.configure_cache(tmp_path)
+    monkeypatch.setattr(client, "_get", get)
+    client.get("https://example.org/a")
+
+    # one file per response, nothing left over from writing it
+    assert [path.suffix for path in (tmp_path / "http").rglob("*") if path.is_file()] == [".response"]
+    client.configure_cache(tmp_path, offline=True)
+    response = client.get("https://example.org/a")
+    assert (response.status_code, response.headers["etag"], response.json()) == (200, '"1"', {"a": 1})
@@ -0,0 +1,56 @@
+from collector.journal import Journal
+from collector.models import MCPServer
+
+def server(name: str) -> MCPServer:
+    return MCPServer(package_registry="npm", package_name=name, description="")
+
+def test_resume_after_interrupted_run(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal()
+    journal.configure(path, max_attempts=2)
+    journal.record(server("written"), "resolved")
+    journal.record(server("written"), "verified")
+    journal.record(server("written"), "written", filename="npm_written.json")
+    journal.record(server("deleted"), "written", filename="npm_deleted.json")
+    journal.record(server("resolved"), "resolved")
+    journal.record(server("failed-once"), "failed", reason="timeout")
+    journal.record(server("failed-twice"), "failed", reason="timeout")
+    journal.record(server("failed-twice"), "failed", reason="timeout")
+    # the run is killed while writing a line
+    journal._file.write('{"server": "npm:killed", "sta')
+    journal._file.flush()
+
+    resumed = Journal()
+    resumed.configure(path, resume=True, max_attempts=2)
+    package_files = {"npm_written.json"}
+    assert not resumed.pending(server("written"), package_files)
+    # written, but no longer in the dataset
+    assert resumed.pending(server("deleted"), package_files)
+    assert resumed.pending(server("resolved"), package_files)
+    assert resumed.pending(server("failed-once"), package_files)
+    assert not resumed.pending(server("failed-twice"), package_files)
+    assert resumed.pending(server("killed"), package_files)
+    assert resumed.pending(server("new"), package_files)
+
+    # attempts add up across resumed runs
+    resumed.record(server("failed-once"), "failed", reason="timeout")
+    again = Journal()
+    again.configure(path, resume=True, max_attempts=2)
+    assert not again.pending(server("failed-once"), package_files)
+    again.configure(path, resume=True, max_attempts=3)
+    assert again.pending(server("failed-once"), package_files)
+    assert again.pending(server("failed-twice"), package_files)
+
+def test_new_run_forgets_previous(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal()
+    journal.configure(path)
+    journal.record(server("written"), "written", filename="npm_written.json")
+    fresh = Journal()
+    fresh.configure(path)
+    assert fresh.pending(server("written"), {"npm_written.json"})
+
+def test_unconfigured_journal_records_nothing():
+    journal = Journal()
+    journal.record(server("a"), "written", filename="npm_a.json")
+    assert journal.pending(server("a"), {"npm_a.json"})
@@ -0,0 +1,72 @@
+from collector.dataset import Dataset, package_info_filename, write_package_info
+from collector.main import can_reuse, load_previous_package_info
+from collector.models import PACKAGE_INFO_FORMAT_VERSION, Artifact, Attestation, DependencyGraph, MCPServer, Package, PackageInfo
+
+def make_package_info(name: str) -> PackageInfo:
+    return PackageInfo(
+        format_version=PACKAGE_INFO_FORMAT_VERSION,
+        name=name,
+        packages={name: Package(
+            type="pypi",
+            version="1.0.0",
+            artifacts=[Artifact(name=f"{name}-1.0.0.tar.gz", hash="sha256:00", attestations=[Attestation(error_code="missing")])],
+            dependencies=[],
+        )},
+    )
+
+def test_previous_package_info_of_differently_spelled_name(tmp_path):
+    # written under the name in the lock file, looked up by the name in the registry
+    package_info = make_package_info("mcp-server-example")
+    write_package_info(Dataset(tmp_path), package_info_filename("pypi", package_info.name), package_info)
+    server = MCPServer(package_registry="pypi", package_name="MCP_Server.Example", description="")
+    assert load_previous_package_info(tmp_path, server) == package_info
+
+def test_no_previous_package_info(tmp_path):
+    server = MCPServer(package_registry="pypi", package_name="mcp-server-example", description="")
+    assert load_previous_package_info(tmp_path, server) is None
+
+def test_invalid_previous_package_info(tmp_path):
+    server = MCPServer(package_registry="pypi", package_name="mcp-server-example", description="")
+    path = tmp_path / "packages" / package_info_filename("pypi", server.package_name)
+    path.parent.mkdir()
+    path.write_text('{"format_version": 4, "name": "mcp-server-example", "packages": {')
+    assert load_previous_package_info(tmp_path, server) is None
+    path.write_text('{"format_version": 4, "name": "mcp-server-example"}')
+    assert load_previous_package_info(tmp_path, server) is None
+
+def test_invalid_previous_statement(tmp_path):
+    package_info = make_package_info("mcp-server-example")
+    package_info.packages["mcp-server-example"].artifacts[0].attestations = [Attestation(issuer="GitHub", statement={"_type": "x"})]
+    dataset = Dataset(tmp_path)
+    write_package_info(dataset, package_info_filename("pypi", package_info.name), package_info)
+    for path in (tmp_path / "store").rglob("*.json"):
+        if b'"_type"' in path.read_bytes():
+            path.write_text("{")
+    server = MCPServer(package_registry="pypi", package_name="mcp-server-example", description="")
+    assert load_previous_package_info(tmp_path, server) is None
+
+def reuse_case(**changes) -> tuple[PackageInfo, PackageInfo, MCPServer]:
+    server = MCPServer(package_registry="pypi", package_name="mcp-server-example", repo_url="https://github.com/example/server", description="")
+    current = make_package_info("mcp-server-example")
+    current.graph = DependencyGraph(nodes=["mcp-server-example"], edges=[[]])
+    previous = current.model_copy(deep=True, update={"repo_url": server.repo_url, **changes})
+    return previous, current, server
+
+def test_reuse_unchanged():
+    assert can_reuse(*reuse_case())
+
+def test_no_reuse_of_older_format():
+    assert not can_reuse(*reuse_case(format_version=3))
+
+def test_no_reuse_after_repository_change():
+    assert not can_reuse(*reuse_case(repo_url="https://github.com/example/old-server"))
+    # written before the repository was recorded
+    assert not can_reuse(*reuse_case(repo_url=None))
+
+def test_no_reuse_of_other_graph():
+    assert not can_reuse(*reuse_case(graph=None))
+
+def test_no_reuse_with_transient_errors():
+    previous, current, server = reuse_case()
+    previous.packages["mcp-server-example"].artifacts[0].attestations = [Attestation(error_code="transient")]
+    assert not can_reuse(previous, current, server)
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+from collector import mcp_registry_downloader
+from collector.mcp_registry_downloader import iter_registry, read_registry_snapshot
+
+def entry(idx: int, updated_at: str, status: str="active") -> dict:
+    return {
+        "name": f"io.github.example/server-{idx}",
+        "version": "1.0.0",
+        "_meta": {"io.modelcontextprotocol.registry/official": {"id": f"server-{idx}", "updatedAt": updated_at, "status": status}},
+    }
+
+class FakeRegistry:
+    def __init__(self, entries: list[dict]):
+        self.entries = entries
+        self.calls: list[str | None] = []
+
+    def fetch(self, updated_since: str | None=None):
+        self.calls.append(updated_since)
+        meta = mcp_registry_downloader._official_meta
+        return iter([e for e in self.entries if updated_since is None or meta(e)["updatedAt"] > updated_since])
+
+def names(path) -> list[str]:
+    return [e["name"] for e in read_registry_snapshot(path)]
+
+def test_incremental_update_drops_deleted(tmp_path, monkeypatch):
+    registry = FakeRegistry([entry(1, "2025-01-01T00:00:00Z"), entry(2, "2025-01-02T00:00:00Z")])
+    monkeypatch.setattr(mcp_registry_downloader, "_fetch_entries", registry.fetch)
+    snapshot = tmp_path / "registry.jsonl"
+    list(iter_registry(snapshot))
+    assert names(snapshot) == ["io.github.example/server-1", "io.github.example/server-2"]
+
+    registry.entries = [entry(1, "2025-01-03T00:00:00Z", "deleted"), entry(2, "2025-01-02T00:00:00Z"), entry(3, "2025-01-03T00:00:00Z")]
+    yielded = [e["name"] for e in iter_registry(snapshot)]
+    assert registry.calls == [None, "2025-01-02T00:00:00Z"]
+    assert yielded == names(snapshot) == ["io.github.example/server-2", "io.github.example/server-3"]
+
+def test_periodic_full_sync(tmp_path, monkeypatch):
+    registry = FakeRegistry([entry(1, "2025-01-01T00:00:00Z"), entry(2, "2025-01-02T00:00:00Z")])
+    monkeypatch.setattr(mcp_registry_downloader, "_fetch_entries", registry.fetch)
+    snapshot = tmp_path / "registry.jsonl"
+    list(iter_registry(snapshot))
+
+    # server 1 disappears from the registry without being marked as deleted
+    registry.entries = registry.entries[1:]
+    list(iter_registry(snapshot))
+    assert registry.calls[-1] is not None
+    assert len(names(snapshot)) == 2
+
+    last_sync = datetime.now(timezone.utc) - timedelta(days=8)
+    (tmp_path / "registry.jsonl.full-sync").write_text(last_sync.isoformat())
+    list(iter_registry(snapshot))
+    assert registry.calls[-1] is None
+    assert names(snapshot) == ["io.github.example/server-2"]
+    # the next update is incremental again
+    list(iter_registry(snapshot))
+    assert registry.calls[-1] is not None
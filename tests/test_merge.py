@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.server import StandInServer
+from collector.dataset import MANIFEST_PATH, RUN_REPORT_PATH, Dataset
+from collector.http_client import http_client
+from collector.main import build_dataset
+from collector.mcp_registry_downloader import iter_registry
+from collector.merge import merge_datasets
+from collector.sharding import load_server_costs, parse_shard
+
+@pytest.fixture(scope="module")
+def registry(tmp_path_factory):
+    """Snapshot of the small synthetic registry, with the stand-in server answering the collector's requests."""
+    with StandInServer("small") as server:
+        http_client.configure(url_overrides=server.url_overrides)
+        registry_path = tmp_path_factory.mktemp("registry") / "registry.jsonl"
+        for _ in iter_registry(registry_path):
+            pass
+        yield registry_path
+    http_client.configure()
+
+def dataset_files(out_dir: Path) -> dict[str, bytes]:
+    # the run report has the timings of the run, and the manifest its hashed name
+    return {
+        str(path.relative_to(out_dir)): path.read_bytes() for path in out_dir.rglob("*")
+        if path.is_file() and not path.name.startswith((Path(RUN_REPORT_PATH).stem, MANIFEST_PATH))
+    }
+
+def build_shards(tmp_path: Path, registry: Path, output_format: str, costs: dict[str, float] | None=None) -> list[Path]:
+    shard_dirs = [tmp_path / f"shard-{i}" for i in (1, 2)]
+    for i, shard_dir in enumerate(shard_dirs, 1):
+        build_dataset(tmp_path / "tmp", shard_dir, registry_path=registry, update_registry=False,
+                      shard=parse_shard(f"{i}/2"), shard_costs=costs, output_format=output_format)
+    # each server is collected by exactly one shard
+    package_files = [set(Dataset.open(shard_dir).package_files()) for shard_dir in shard_dirs]
+    assert all(package_files) and not package_files[0] & package_files[1]
+    return shard_dirs
+
+@pytest.mark.parametrize("output_format", ["plain", "hashed"])
+def test_merge_matches_serial_run(tmp_path, registry, output_format):
+    build_dataset(tmp_path / "tmp", tmp_path / "serial", registry_path=registry, update_registry=False,
+                  output_format=output_format)
+    serial = dataset_files(tmp_path / "serial")
+    assert any(path.startswith("packages") for path in serial)
+
+    merge_datasets(build_shards(tmp_path, registry, output_format), tmp_path / "merged", output_format)
+    assert dataset_files(tmp_path / "merged") == serial
+
+    # the next run balances the shards by the costs in the merged run report, which moves servers
+    # between shards, and the shards still have the files of the first run
+    costs = load_server_costs(tmp_path / "merged")
+    assert len(costs) == len(Dataset.open(tmp_path / "serial").package_files())
+    merge_datasets(build_shards(tmp_path, registry, output_format, costs), tmp_path / "merged", output_format)
+    assert dataset_files(tmp_path / "merged") == serial
@@ -0,0 +1,163 @@
+import base64
+import hashlib
+
+import pytest
+
+from collector import npm_resolver
+from collector.npm_package_info import packages_from_npm_lock
+from collector.npm_resolver import PackumentCache, ResolutionError, pick_version, resolve_npm_lock
+
+def integrity(name: str, version: str) -> str:
+    return "sha512-" + base64.b64encode(hashlib.sha512(f"{name}@{version}".encode()).digest()).decode()
+
+def packument(name: str, versions: dict[str, dict], latest: str | None=None, deprecated: tuple[str, ...]=()) -> dict:
+    """Abbreviated packument of a package, given as version -> manifest fields."""
+    return {
+        "name": name,
+        "dist-tags": {"latest": latest or max(versions, key=lambda v: tuple(map(int, v.split("-")[0].split("."))))},
+        "versions": {
+            version: {
+                "name": name,
+                "version": version,
+                "dist": {
+                    "tarball": f"https://registry.npmjs.org/{name}/-/{name}-{version}.tgz",
+                    "integrity": integrity(name, version),
+                },
+                **({"deprecated": "do not use"} if version in deprecated else {}),
+                **fields,
+            }
+            for version, fields in versions.items()
+        },
+    }
+
+class CannedPackuments:
+    def __init__(self, *packuments: dict):
+        self.packuments = {p["name"]: p for p in packuments}
+
+    def get(self, name: str) -> dict:
+        if name not in self.packuments:
+            raise ResolutionError(f"Package '{name}' not found on npm")
+        return self.packuments[name]
+
+@pytest.fixture
+def registry(monkeypatch):
+    def use(*packuments: dict):
+        monkeypatch.setattr(npm_resolver, "packument_cache", CannedPackuments(*packuments))
+    return use
+
+def test_hoisting(registry):
+    registry(
+        packument("server", {"1.0.0": {"dependencies": {"a": "^1.0.0", "b": "^1.0.0"}}}),
+        packument("a", {"1.0.0": {"dependencies": {"shared": "^1.0.0"}}}),
+        packument("b", {"1.0.0": {"dependencies": {"shared": "^1.1.0"}}}),
+        packument("shared", {"1.0.0": {}, "1.2.0": {}, "2.0.0": {}}, latest="2.0.0"),
+    )
+    lock = resolve_npm_lock("server", "*")
+    assert list(lock["packages"]) == ["", "node_modules/a", "node_modules/b", "node_modules/server", "node_modules/shared"]
+    # the highest version in range, as the latest tag is out of range
+    assert lock["packages"]["node_modules/shared"]["version"] == "1.2.0"
+    assert lock["packages"]["node_modules/shared"]["integrity"] == integrity("shared", "1.2.0")
+
+def test_nesting_conflicting_versions(registry):
+    registry(
+        packument("server", {"1.0.0": {"dependencies": {"a": "^1.0.0", "b": "^1.0.0"}}}),
+        packument("a", {"1.0.0": {"dependencies": {"shared": "^1.0.0"}}}),
+        packument("b", {"1.0.0": {"dependencies": {"shared": "^2.0.0"}}}),
+        packument("shared", {"1.0.0": {}, "2.0.0": {}}),
+    )
+    lock = resolve_npm_lock("server", "*")
+    assert lock["packages"]["node_modules/shared"]["version"] == "1.0.0"
+    assert lock["packages"]["node_modules/b/node_modules/shared"]["version"] == "2.0.0"
+    assert "node_modules/a/node_modules/shared" not in lock["packages"]
+
+    packages = packages_from_npm_lock(lock)
+    assert packages["a"].dependencies == ["shared"]
+    assert packages["b"].dependencies == ["shared@2.0.0"]
+    assert packages["shared@2.0.0"].name == "shared"
+    assert packages["shared@2.0.0"].artifacts[0].name == "pkg:npm/shared@2.0.0"
+
+def test_nested_dependency_found_from_ancestor(registry):
+    # c is nested below b, so it has to use the shared@2 next to it rather than the hoisted one
+    registry(
+        packument("server", {"1.0.0": {"dependencies": {"a": "^1.0.0", "b": "^1.0.0"}}}),
+        packument("a", {"1.0.0": {"dependencies": {"c": "^1.0.0", "shared": "^1.0.0"}}}),
+        packument("b", {"1.0.0": {"dependencies": {"c": "^2.0.0", "shared": "^2.0.0"}}}),
+        packument("c", {"1.0.0": {}, "2.0.0": {"dependencies": {"shared": "^2.0.0"}}}),
+        packument("shared", {"1.0.0": {}, "2.0.0": {}}),
+    )
+    lock = resolve_npm_lock("server", "*")
+    assert lock["packages"]["node_modules/b/node_modules/c"]["version"] == "2.0.0"
+    assert lock["packages"]["node_modules/b/node_modules/shared"]["version"] == "2.0.0"
+    assert "node_modules/b/node_modules/c/node_modules/shared" not in lock["packages"]
+
+    packages = packages_from_npm_lock(lock)
+    assert packages["c@2.0.0"].dependencies == ["shared@2.0.0"]
+    assert packages["b"].dependencies == ["c@2.0.0", "shared@2.0.0"]
+
+@pytest.mark.parametrize("x_needs_shared", [False, True])
+def test_hoisting_below_conflict(registry, x_needs_shared):
+    # a@2 is nested below x and needs shared@2, which conflicts with the hoisted shared@1
+    registry(
+        packument("server", {"1.0.0": {"dependencies": {"a": "^1.0.0", "shared": "^1.0.0", "x": "^1.0.0"}}}),
+        packument("x", {"1.0.0": {"dependencies": {"a": "^2.0.0", **({"shared": "^1.0.0"} if x_needs_shared else {})}}}),
+        packument("a", {"1.0.0": {}, "2.0.0": {"dependencies": {"shared": "^2.0.0"}}}),
+        packument("shared", {"1.0.0": {}, "2.0.0": {}}),
+    )
+    lock = resolve_npm_lock("server", "*")
+    assert lock["packages"]["node_modules/x/node_modules/a"]["version"] == "2.0.0"
+    if x_needs_shared:
+        # below x, it would hide the shared@1 that x uses
+        nested = ["node_modules/x/node_modules/a/node_modules/shared"]
+    else:
+        nested = ["node_modules/x/node_modules/shared"]
+    assert [path for path in lock["packages"] if path.endswith("/node_modules/shared")] == nested
+    assert lock["packages"][nested[0]]["version"] == "2.0.0"
+
+def test_alias_and_optional_dependencies(registry):
+    registry(
+        packument("server", {"1.0.0": {
+            "dependencies": {"width-cjs": "npm:width@^1.0.0"},
+            "optionalDependencies": {"missing": "^1.0.0"},
+        }}),
+        packument("width", {"1.0.0": {}, "1.5.0": {}}),
+    )
+    lock = resolve_npm_lock("server", "*")
+    assert lock["packages"]["node_modules/width-cjs"]["name"] == "width"
+    assert lock["packages"]["node_modules/width-cjs"]["version"] == "1.5.0"
+    assert "node_modules/missing" not in lock["packages"]
+
+    packages = packages_from_npm_lock(lock)
+    assert packages["width-cjs"].name == "width"
+    assert packages["width-cjs"].artifacts[0].name == "pkg:npm/width@1.5.0"
+
+def test_missing_required_dependency(registry):
+    registry(packument("server", {"1.0.0": {"dependencies": {"missing": "^1.0.0"}}}))
+    with pytest.raises(ResolutionError):
+        resolve_npm_lock("server", "*")
+
+def test_pick_version(registry):
+    registry(packument("lib", {"1.0.0": {}, "1.1.0": {}, "1.2.0": {}, "2.0.0-beta.1": {}},
+                       latest="1.1.0", deprecated=("1.2.0",)))
+    # the latest tag if it is in range
+    assert pick_version("lib", "^1.0.0")[0] == "1.1.0"
+    assert pick_version("lib", "latest")[0] == "1.1.0"
+    # else the highest version that is not deprecated
+    assert pick_version("lib", ">=1.2.0 || <1.1.0")[0] == "1.0.0"
+    assert pick_version("lib", ">1.1.0")[0] == "1.2.0"
+    assert pick_version("lib", "^2.0.0-beta.0")[0] == "2.0.0-beta.1"
+    with pytest.raises(ResolutionError):
+        pick_version("lib", "^3.0.0")
+
+def test_packument_cache_evicts_least_recently_used(monkeypatch):
+    cache = PackumentCache(max_size=2)
+    loads: list[str] = []
+
+    def load(name: str) -> tuple[dict, bool]:
+        loads.append(name)
+        return {"name": name}, False
+    monkeypatch.setattr(cache, "_load", load)
+
+    for name in ("a", "b", "a", "c", "a", "b"):
+        assert cache.get(name) == {"name": name}
+    assert loads == ["a", "b", "c", "b"]
+    assert (cache.hits, cache.misses) == (2, 4)
@@ -0,0 +1,62 @@
+import pytest
+
+from packaging.requirements import Requirement
+from packaging.version import Version
+
+from collector import pypi_resolver
+from collector.pypi_resolver import ResolutionError, resolve_pypi_dependencies
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Serve canned projects, given as name -> version -> requirements."""
+    def use(projects: dict[str, dict[str, list[str]]]):
+        def get_releases(name: str) -> dict[Version, pypi_resolver._Release]:
+            if name not in projects:
+                raise ResolutionError(f"Package '{name}' not found on PyPI")
+            releases = {}
+            for version in projects[name]:
+                release = pypi_resolver._Release(version)
+                release.files.append({"filename": f"{name}-{version}-py3-none-any.whl", "hashes": {"sha256": f"{name}{version}"}})
+                releases[Version(version)] = release
+            return releases
+
+        def get_requirements(name: str, version: Version) -> tuple[Requirement, ...]:
+            return tuple(Requirement(requirement) for requirement in projects[name][str(version)])
+
+        monkeypatch.setattr(pypi_resolver, "get_releases", get_releases)
+        monkeypatch.setattr(pypi_resolver, "get_requirements", get_requirements)
+    return use
+
+def versions(packages) -> dict[str, str]:
+    return {name: package.version for name, package in packages.items()}
+
+def test_highest_versions(registry):
+    registry({
+        "server": {"1.0": ["a", "b>=1.1"]},
+        "a": {"1.0": [], "2.0": ["b<2"]},
+        "b": {"1.0": [], "1.1": [], "2.0": []},
+    })
+    packages = resolve_pypi_dependencies("server", "*")
+    assert versions(packages) == {"server": "1.0", "a": "2.0", "b": "1.1"}
+    assert packages["server"].dependencies == ["a", "b"]
+    assert packages["a"].artifacts[0].hash == "sha256:a2.0"
+
+def test_pins_of_replaced_release_are_dropped(registry):
+    registry({
+        "server": {"1.0": ["a", "b"]},
+        # a 2.0 is selected first and pins c, but b only works with a 1.0, which needs a newer c
+        "a": {"1.0": ["c>=2"], "2.0": ["c==1.0"]},
+        "b": {"1.0": ["a<2"]},
+        "c": {"1.0": [], "2.0": []},
+    })
+    assert versions(resolve_pypi_dependencies("server", "*")) == {"server": "1.0", "a": "1.0", "b": "1.0", "c": "2.0"}
+
+def test_unsatisfiable(registry):
+    registry({
+        "server": {"1.0": ["a", "b"]},
+        "a": {"1.0": ["c==1.0"]},
+        "b": {"1.0": ["c==2.0"]},
+        "c": {"1.0": [], "2.0": []},
+    })
+    with pytest.raises(ResolutionError):
+        resolve_pypi_dependencies("server", "*")
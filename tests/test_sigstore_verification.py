@@ -0,0 +1,140 @@
+import base64
+import datetime
+import hashlib
+import json
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from sigstore import dsse
+from sigstore.errors import VerificationError
+from sigstore.models import Bundle
+
+from collector.npm_attestations import _check_repository_url
+from collector.sigstore_verification import _validate_intoto_v002_entry_body
+
+# A bundle in the layout of npm provenance bundles, with an intoto v0.0.2 log entry, signed by a
+# throwaway key. Its certificate and log entry are not trusted by the Sigstore production trust
+# root, so only the checks of the envelope and the log entry body are tested here.
+
+STATEMENT = {
+    "_type": "https://in-toto.io/Statement/v1",
+    "subject": [{"name": "pkg:npm/example@1.0.0", "digest": {"sha512": "00" * 64}}],
+    "predicateType": "https://slsa.dev/provenance/v1",
+    "predicate": {},
+}
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+def _certificate(key: ec.EllipticCurvePrivateKey) -> x509.Certificate:
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "sigstore-test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(minutes=10))
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+def make_bundle(payload: bytes=json.dumps(STATEMENT).encode(), entry_sig=None, entry_payload: bytes | None=None) -> dict:
+    key = ec.generate_private_key(ec.SECP256R1())
+    certificate = _certificate(key)
+    pae = b"DSSEv1 %d %s %d %s" % (len(dsse.Envelope._TYPE), dsse.Envelope._TYPE.encode(), len(payload), payload)
+    signature = key.sign(pae, ec.ECDSA(hashes.SHA256()))
+    entry_body = {
+        "apiVersion": "0.0.2",
+        "kind": "intoto",
+        "spec": {"content": {
+            "envelope": {
+                "payloadType": dsse.Envelope._TYPE,
+                "signatures": [{
+                    "publicKey": _b64(certificate.public_bytes(serialization.Encoding.PEM)),
+                    "sig": entry_sig(signature) if entry_sig is not None else _b64(_b64(signature).encode()),
+                }],
+            },
+            "hash": {"algorithm": "sha256", "value": "00" * 32},
+            "payloadHash": {"algorithm": "sha256", "value": hashlib.sha256(entry_payload or payload).hexdigest()},
+        }},
+    }
+    return {
+        "mediaType": "application/vnd.dev.sigstore.bundle.v0.3+json",
+        "verificationMaterial": {
+            "certificate": {"rawBytes": _b64(certificate.public_bytes(serialization.Encoding.DER))},
+            "tlogEntries": [{
+                "logIndex": "1",
+                "logId": {"keyId": _b64(b"\0" * 32)},
+                "kindVersion": {"kind": "intoto", "version": "0.0.2"},
+                "integratedTime": "1",
+                "inclusionPromise": {"signedEntryTimestamp": _b64(b"\0" * 64)},
+                "inclusionProof": {
+                    "logIndex": "1",
+                    "rootHash": _b64(b"\0" * 32),
+                    "treeSize": "2",
+                    "hashes": [],
+                    "checkpoint": {"envelope": "checkpoint"},
+                },
+                "canonicalizedBody": _b64(json.dumps(entry_body).encode()),
+            }],
+        },
+        "dsseEnvelope": {
+            "payload": _b64(payload),
+            "payloadType": dsse.Envelope._TYPE,
+            "signatures": [{"sig": _b64(signature), "keyid": ""}],
+        },
+    }
+
+def verify_envelope_and_entry(bundle_json: dict):
+    bundle = Bundle.from_json(json.dumps(bundle_json))
+    envelope = bundle._dsse_envelope
+    assert envelope is not None
+    dsse._verify(bundle.signing_certificate.public_key(), envelope)
+    _validate_intoto_v002_entry_body(bundle)
+
+def test_valid_bundle():
+    verify_envelope_and_entry(make_bundle())
+
+def test_tampered_payload():
+    bundle_json = make_bundle()
+    tampered = dict(STATEMENT, subject=[{"name": "pkg:npm/other@1.0.0", "digest": {"sha512": "00" * 64}}])
+    bundle_json["dsseEnvelope"]["payload"] = _b64(json.dumps(tampered).encode())
+    with pytest.raises(VerificationError):
+        verify_envelope_and_entry(bundle_json)
+
+def test_log_entry_of_other_payload():
+    with pytest.raises(VerificationError, match="payload hash"):
+        verify_envelope_and_entry(make_bundle(entry_payload=b"{}"))
+
+def test_single_base64_log_entry_signature():
+    with pytest.raises(VerificationError, match="signatures"):
+        verify_envelope_and_entry(make_bundle(entry_sig=_b64))
+
+def test_log_entry_of_other_signature():
+    with pytest.raises(VerificationError, match="signatures"):
+        verify_envelope_and_entry(make_bundle(entry_sig=lambda signature: _b64(_b64(signature[::-1]).encode())))
+
+@pytest.mark.parametrize("expected", [
+    "https://github.com/owner/repo",
+    "https://github.com/Owner/Repo",
+    "https://github.com/owner/repo.git",
+    "git+https://github.com/owner/repo.git",
+    "https://github.com/owner/repo/",
+])
+def test_repository_url_matches(expected):
+    _check_repository_url(expected, "https://github.com/owner/repo")
+
+@pytest.mark.parametrize("expected", [
+    "https://github.com/owner/other",
+    "https://gitlab.com/owner/repo",
+    "https://github.com/owner/repo-fork",
+])
+def test_repository_url_mismatch(expected):
+    with pytest.raises(VerificationError, match="expected"):
+        _check_repository_url(expected, "https://github.com/owner/repo")